@@ -0,0 +1,58 @@
+"""Compare the serial login path with the batched bootstrap.
+
+Runs against the stand-in Parse server from the tests with a fixed latency
+added to each request. Run from the repository root:
+
+    python -m benchmarks.bench_bootstrap
+"""
+
+import asyncio
+import time
+
+from aiohttp.test_utils import TestServer
+import httpx
+
+from custom_components.pixieplus import pixieplus_cloud
+from tests.fake_parse_server import MOUNT_PATH, FakeParseServer
+
+LATENCY = 0.05
+ROUNDS = 5
+
+
+async def serial_setup(client):
+    """The login() + home_object() path bootstrap() replaced."""
+    cloud = pixieplus_cloud.PixiePlusCloud(client, "user@example.com", "password")
+    await cloud.login()
+    await cloud.home_object()
+    return await cloud.credentials()
+
+
+async def bootstrap_setup(client):
+    cloud = pixieplus_cloud.PixiePlusCloud(client, "user@example.com", "password")
+    await cloud.bootstrap()
+    return await cloud.credentials()
+
+
+async def main():
+    fake = FakeParseServer(delay=LATENCY)
+    async with TestServer(fake.app) as server:
+        pixieplus_cloud.PIXIE_PLUS_CLOUD_URL = str(server.make_url(MOUNT_PATH + "/"))
+        async with httpx.AsyncClient() as client:
+            for name, setup in (
+                ("serial", serial_setup),
+                ("bootstrap", bootstrap_setup),
+            ):
+                fake.requests.clear()
+                start = time.perf_counter()
+                for _ in range(ROUNDS):
+                    await setup(client)
+                elapsed = (time.perf_counter() - start) / ROUNDS
+                print(
+                    f"{name:>10}: {elapsed * 1000:7.1f} ms, "
+                    f"{len(fake.requests) // ROUNDS} requests "
+                    f"({LATENCY * 1000:.0f} ms per request)"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""Compare the conversion tables with per update colorsys and range maths.
+
+Simulates the light updates of a whole home: every RGB light converts its
+hue and every light its brightness. Run from the repository root:
+
+    python -m benchmarks.bench_color_utils
+"""
+
+import colorsys
+import random
+import timeit
+
+from custom_components.pixieplus import color_utils
+
+NUMBER = 200
+
+
+def convert_computed(statuses):
+    """The per update conversions the tables replaced."""
+    for br, hue in statuses:
+        if hue is None or hue > 360:
+            rgb = (255, 255, 255)
+        else:
+            rgb = tuple(
+                channel * 255 for channel in colorsys.hsv_to_rgb(hue / 360, 1, 1)
+            )
+        brightness = color_utils.convert_value_to_available_range(br, 0, 100, 0, 255)
+    return rgb, brightness
+
+
+def convert_table(statuses):
+    for br, hue in statuses:
+        rgb = color_utils.hue_to_rgb(hue)
+        brightness = color_utils.br_to_brightness(br)
+    return rgb, brightness
+
+
+def main():
+    for device_count in (10, 50, 200):
+        statuses = [
+            (random.randint(0, 100), random.randint(0, 360))
+            for _ in range(device_count)
+        ]
+        before = timeit.timeit(lambda: convert_computed(statuses), number=NUMBER)
+        after = timeit.timeit(lambda: convert_table(statuses), number=NUMBER)
+        print(
+            f"{device_count:4} lights  computed {before / NUMBER * 1e6:8.2f} us"
+            f"  table {after / NUMBER * 1e6:8.2f} us  x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare the precompiled BLE frame table with the string format path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_command_utils
+"""
+
+import timeit
+
+from custom_components.pixieplus import command_utils as cmd_utils
+from custom_components.pixieplus.const import CMD_ON, CMD_SET_BRIGHTNESS
+
+NUMBER = 100_000
+
+
+def make_ble_command_data_format(type_id, stype_id, device_id, command, data):
+    """The string replace implementation the frame table replaced."""
+    return cmd_utils.construct_ble_data_str(
+        cmd_utils.device_id_to_hex(device_id),
+        cmd_utils.device_command_type(type_id, stype_id, command),
+        cmd_utils.device_command_id(type_id, stype_id, command),
+        "" if data is None else f"{data}",
+    )
+
+
+def main():
+    cases = [
+        ("switch on", (22, 13, 15, CMD_ON, None)),
+        ("dimmer brightness", (23, 13, 15, CMD_SET_BRIGHTNESS, "64")),
+    ]
+    for name, args in cases:
+        assert cmd_utils.make_ble_command_data(*args) == make_ble_command_data_format(
+            *args
+        )
+        before = timeit.timeit(
+            lambda: make_ble_command_data_format(*args), number=NUMBER
+        )
+        after = timeit.timeit(
+            lambda: cmd_utils.make_ble_command_data(*args), number=NUMBER
+        )
+        print(
+            f"{name:20} format {before / NUMBER * 1e6:6.2f} us"
+            f"  table {after / NUMBER * 1e6:6.2f} us  x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare the cloud JSON codec with the stdlib on Home payloads.
+
+Decodes LiveQuery update messages carrying Home objects of growing size,
+as pushed with and without the onlineList projection. Run from the
+repository root:
+
+    python -m benchmarks.bench_json
+"""
+
+import json
+import timeit
+
+from custom_components.pixieplus import pixieplus_cloud
+from custom_components.pixieplus.pixieplus_cloud import HOME_STATUS_KEYS
+from tests.fake_parse_server import home_object
+
+NUMBER = 2_000
+
+
+def update_message(class_object):
+    return json.dumps(
+        {
+            "op": "update",
+            "clientId": "client-1",
+            "requestId": 2,
+            "object": class_object,
+        }
+    )
+
+
+def main():
+    backend = "orjson" if pixieplus_cloud.orjson is not None else "stdlib"
+    print(f"codec backend: {backend}")
+    for device_count in (10, 50, 200):
+        full = home_object(device_count)
+        status = {
+            key: value
+            for key, value in full.items()
+            if key in HOME_STATUS_KEYS or key in ("className", "objectId", "updatedAt")
+        }
+        for name, class_object in (("full", full), ("status", status)):
+            message = update_message(class_object)
+            stdlib = timeit.timeit(lambda: json.loads(message), number=NUMBER)
+            codec = timeit.timeit(
+                lambda: pixieplus_cloud.json_loads(message), number=NUMBER
+            )
+            print(
+                f"{device_count:>4} devices {name:>6} ({len(message):>6} bytes): "
+                f"stdlib {stdlib / NUMBER * 1e6:7.1f} us, "
+                f"codec {codec / NUMBER * 1e6:7.1f} us "
+                f"({stdlib / codec:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 import asyncio
 import logging
 
-from .pixieplus_handler import PixiePlusHandler
+from .pixieplus_handler import PixiePlusHandler, status_store
 
 from .const import (
     CONF_GATEWAY,
@@ -23,7 +23,6 @@ from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers import device_registry as dr
 
-
 # PLATFORMS = [COVER_DOMAIN, LIGHT_DOMAIN, SWITCH_DOMAIN]
 PLATFORMS = [LIGHT_DOMAIN]
 
@@ -65,9 +64,27 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         sw_version=gateway[CONF_FIRMWARE],
     )
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # Entities start from the last known statuses while the cloud catches up
+    await handler.async_load_status()
+    handler.async_start()
+
+    try:
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    except Exception:
+        # Unload is not called for an entry that failed to set up
+        await handler.async_shutdown()
+        hass.data[DOMAIN].pop(entry.entry_id)
+        raise
+
+    # Options are read when the handler is created, so apply changes with a
+    # reload. Session updates to the entry data do not need one.
+    options = dict(entry.options)
 
-    await handler.async_config_entry_first_refresh()
+    async def _async_entry_updated(hass: HomeAssistant, entry: ConfigEntry):
+        if dict(entry.options) != options:
+            await hass.config_entries.async_reload(entry.entry_id)
+
+    entry.async_on_unload(entry.add_update_listener(_async_entry_updated))
 
     return True
 
@@ -90,3 +107,8 @@ async def async_unload_entry(hass, entry) -> bool:
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass, entry) -> None:
+    """Remove the statuses saved for a deleted config entry."""
+    await status_store(hass, entry.entry_id).async_remove()
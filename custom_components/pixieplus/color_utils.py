@@ -0,0 +1,56 @@
+import colorsys
+
+PIXIE_MAX_HUE = 360
+PIXIE_MAX_BRIGHTNESS = 100
+HA_MAX_BRIGHTNESS = 255
+
+RGB_WHITE = (255, 255, 255)
+
+
+def convert_value_to_available_range(value, min_from, max_from, min_to, max_to) -> int:
+    normalized = (value - min_from) / (max_from - min_from)
+    new_value = min(
+        round((normalized * (max_to - min_to)) + min_to),
+        max_to,
+    )
+    return max(new_value, min_to)
+
+
+# Hue and brightness are small integer domains, so every conversion an
+# entity needs is computed once here and shared by all of them
+HUE_TO_RGB = tuple(
+    tuple(round(channel * 255) for channel in colorsys.hsv_to_rgb(hue / 360, 1, 1))
+    for hue in range(PIXIE_MAX_HUE + 1)
+)
+BR_TO_BRIGHTNESS = tuple(
+    convert_value_to_available_range(br, 0, PIXIE_MAX_BRIGHTNESS, 0, HA_MAX_BRIGHTNESS)
+    for br in range(PIXIE_MAX_BRIGHTNESS + 1)
+)
+BRIGHTNESS_TO_BR = tuple(
+    convert_value_to_available_range(
+        brightness, 0, HA_MAX_BRIGHTNESS, 0, PIXIE_MAX_BRIGHTNESS
+    )
+    for brightness in range(HA_MAX_BRIGHTNESS + 1)
+)
+
+
+def hue_to_rgb(hue) -> tuple:
+    """
+    Args :
+        hue: The Pixie hue, 0-360. Anything else means white.
+    Returns :
+        The (red, green, blue) colour, each 0-255.
+    """
+    if hue is None or not 0 <= hue <= PIXIE_MAX_HUE:
+        return RGB_WHITE
+    return HUE_TO_RGB[int(hue)]
+
+
+def br_to_brightness(br) -> int:
+    """Home Assistant brightness (0-255) for a Pixie br (0-100)."""
+    return BR_TO_BRIGHTNESS[min(max(int(br), 0), PIXIE_MAX_BRIGHTNESS)]
+
+
+def brightness_to_br(brightness) -> int:
+    """Pixie br (0-100) for a Home Assistant brightness (0-255)."""
+    return BRIGHTNESS_TO_BR[min(max(int(brightness), 0), HA_MAX_BRIGHTNESS)]
@@ -1,11 +1,28 @@
+from collections import namedtuple
+
 from .const import (
     PIXIE_DEVICES_SPECS,
     CMD_PLUG_SWITCH_TYPE,
     CMD_LIGHT_SWITCH_TYPE,
     CMD_LIGHT_DIMMER_TYPE,
+    CMD_LIGHT_EFFECT_TYPE,
     CMD_BLE_DATA_FORMAT,
 )
 
+BleFrame = namedtuple("BleFrame", ["dest", "command_type", "command_id", "payload"])
+
+BLE_DATA_LENGTH = 40
+BLE_FRAME_LENGTH = BLE_DATA_LENGTH // 2
+BLE_FRAME_HEAD = bytes.fromhex(CMD_BLE_DATA_FORMAT.replace("-", "").split("{{")[0])
+
+# Number of state bytes between the command type and the command id
+BLE_COMMAND_TYPE_PAYLOAD_LENGTH = {
+    bytes.fromhex(CMD_LIGHT_DIMMER_TYPE): 1,
+    bytes.fromhex(CMD_LIGHT_SWITCH_TYPE): 0,
+    bytes.fromhex(CMD_PLUG_SWITCH_TYPE): 0,
+    bytes.fromhex(CMD_LIGHT_EFFECT_TYPE): 0,
+}
+
 
 def make_ble_command_data(type_id, stype_id, device_id, command, data):
     """
@@ -16,19 +33,98 @@ def make_ble_command_data(type_id, stype_id, device_id, command, data):
         command: The command as a string.
         data: The parameters for the command as object.
     """
-    command_id = device_command_id(type_id, stype_id, command)
-    command_type = device_command_type(type_id, stype_id, command)
-    command_dest = device_id_to_hex(device_id)
+    frame = BLE_FRAME_TABLE.get((type_id, stype_id, command), None)
+    if frame is None:
+        # Not a valid combination, let the lookups raise the matching error
+        device_command_id(type_id, stype_id, command)
+        device_command_type(type_id, stype_id, command)
+        raise ValueError(
+            f"Command '{command}' has no mapping for device type {type_id} stype {stype_id}"
+        )
 
-    command_data = ""
-    if data is not None:
-        command_data = f"{data}"
+    head, middle, tail = frame
+    command_data = "" if data is None else f"{data}"
 
-    ble_data = construct_ble_data_str(
-        command_dest, command_type, command_id, command_data
+    return f"{head}{device_id:02x}{middle}{command_data}{tail}".ljust(
+        BLE_DATA_LENGTH, "0"
     )
 
-    return ble_data
+
+def encode_ble_frame(
+    dest: int, command_type: bytes, command_id: bytes, payload: bytes = b""
+) -> bytes:
+    """Build a zero padded BLE frame as bytes."""
+    frame = bytearray(BLE_FRAME_LENGTH)
+    frame_data = b"".join(
+        (BLE_FRAME_HEAD, bytes((dest,)), command_type, payload, command_id)
+    )
+    if len(frame_data) > BLE_FRAME_LENGTH:
+        raise ValueError(f"BLE frame too long ({len(frame_data)} bytes)")
+    frame[: len(frame_data)] = frame_data
+    return bytes(frame)
+
+
+def decode_ble_frame(frame) -> BleFrame:
+    """Parse a BLE frame given as hex str, bytes or memoryview."""
+    if isinstance(frame, str):
+        frame = bytes.fromhex(frame)
+    frame = memoryview(frame)
+
+    head_length = len(BLE_FRAME_HEAD)
+    if len(frame) != BLE_FRAME_LENGTH or frame[:head_length] != BLE_FRAME_HEAD:
+        raise ValueError(f"Not a Pixie BLE frame: {bytes(frame).hex()}")
+
+    dest = frame[head_length]
+    body = frame[head_length + 1 :]
+    for command_type, payload_length in BLE_COMMAND_TYPE_PAYLOAD_LENGTH.items():
+        if body[: len(command_type)] != command_type:
+            continue
+        offset = len(command_type)
+        return BleFrame(
+            dest,
+            command_type,
+            bytes(body[offset + payload_length : offset + payload_length + 1]),
+            bytes(body[offset : offset + payload_length]),
+        )
+
+    raise ValueError(f"Unknown BLE command type: {bytes(frame).hex()}")
+
+
+def frame_commands(type_id, stype_id, frame: BleFrame):
+    """Return every command a decoded frame could carry for a device.
+
+    Some devices share one command type and id between several commands,
+    e.g. colour, brightness and effect on RGB strips, so a frame alone does
+    not always tell them apart.
+    """
+    return BLE_COMMAND_LOOKUP.get(
+        (type_id, stype_id, frame.command_type, frame.command_id), ()
+    )
+
+
+def compile_ble_frame_table(device_specs=PIXIE_DEVICES_SPECS):
+    """Precompute the fixed parts of every BLE frame.
+
+    Returns a dict keyed by (type, stype, command) holding the frame text
+    before the destination, between destination and state, and after state.
+    """
+    ble_format = CMD_BLE_DATA_FORMAT.replace("-", "")
+    head, rest = ble_format.split("{{DEST}}")
+    frame_table = {}
+    for type_id, stypes in device_specs.items():
+        for stype_id, spec in stypes.items():
+            for command, command_id in spec["command_ids"].items():
+                try:
+                    command_type = device_command_type(type_id, stype_id, command)
+                except ValueError:
+                    continue
+                middle, tail = (
+                    rest.replace("{{CMD_TYPE}}", command_type)
+                    .replace("{{CMD_ID}}", command_id)
+                    .split("{{STATE}}")
+                )
+                frame_table[(type_id, stype_id, command)] = (head, middle, tail)
+    return frame_table
 
 
 def construct_ble_data_str(command_dest, command_type, command_id, command_data):
@@ -37,7 +133,7 @@ def construct_ble_data_str(command_dest, command_type, command_id, command_data)
     ble_data = ble_data.replace("{{STATE}}", command_data)
     ble_data = ble_data.replace("{{CMD_ID}}", command_id)
     ble_data = ble_data.replace("-", "")
-    ble_data = ble_data.ljust(40, "0")
+    ble_data = ble_data.ljust(BLE_DATA_LENGTH, "0")
     return ble_data
 
 
@@ -53,7 +149,7 @@ def device_id_to_hex(device_id):
     return f"{device_id:02x}"
 
 
-def device_command_type(type_id, stype_id, command):
+def device_command_type(type_id, stype_id, command=None):
     pixie_device_spec = device_spec(type_id, stype_id)
     command_type = None
     if pixie_device_spec["light_switch"] and (
@@ -84,3 +180,27 @@ def device_command_id(type_id, stype_id, command):
         )
 
     return command_id
+
+
+def compile_ble_command_lookup(device_specs=PIXIE_DEVICES_SPECS):
+    """Map (type, stype, command type, command id) back to the commands."""
+    command_lookup = {}
+    for type_id, stypes in device_specs.items():
+        for stype_id, spec in stypes.items():
+            for command, command_id in spec["command_ids"].items():
+                try:
+                    command_type = device_command_type(type_id, stype_id, command)
+                except ValueError:
+                    continue
+                key = (
+                    type_id,
+                    stype_id,
+                    bytes.fromhex(command_type),
+                    bytes.fromhex(command_id),
+                )
+                command_lookup[key] = command_lookup.get(key, ()) + (command,)
+    return command_lookup
+
+
+BLE_FRAME_TABLE = compile_ble_frame_table()
+BLE_COMMAND_LOOKUP = compile_ble_command_lookup()
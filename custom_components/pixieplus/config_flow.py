@@ -6,25 +6,32 @@ import logging
 import voluptuous as vol
 
 from homeassistant.helpers.httpx_client import get_async_client
-from homeassistant.config_entries import ConfigFlow, CONN_CLASS_CLOUD_PUSH
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigFlow,
+    OptionsFlow,
+    CONN_CLASS_CLOUD_PUSH,
+)
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.core import callback
 from .const import (
     DOMAIN,
     CONF_DEVICES,
     CONF_GATEWAY,
-    CONF_DEVICE_ID,
-    CONF_DEVICE_NAME,
-    CONF_BRIDGE_NAME,
-    CONF_DEVICE_MAC,
-    CONF_TYPE,
-    CONF_STYPE,
-    CONF_MODEL,
-    CONF_MANUFACTURER,
-    CONF_FIRMWARE,
-    PIXIE_DEVICES_SPECS,
+    CONF_COMMAND_BATCH_WINDOW,
+    CONF_GATEWAY_RATE,
+    CONF_GATEWAY_BURST,
+    CONF_STALE_TIMEOUT,
+    CONF_MIN_WRITE_INTERVAL,
+    DEFAULT_COMMAND_BATCH_WINDOW,
+    DEFAULT_GATEWAY_RATE,
+    DEFAULT_GATEWAY_BURST,
+    DEFAULT_STALE_TIMEOUT,
+    DEFAULT_MIN_WRITE_INTERVAL,
 )
 
 from .pixieplus_cloud import PixiePlusCloud
+from .pixieplus_devices import home_devices
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,11 +44,17 @@ class PixiePlusConfigFlow(ConfigFlow, domain=DOMAIN):
 
     config: Optional[Mapping] = {}
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry):
+        return PixiePlusOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input: Optional[Mapping] = None):
         errors = {}
         username: str = ""
         password: str = ""
         pixieplus_cloud = None
+        home_object = None
 
         if user_input is not None:
             username = user_input.get(CONF_USERNAME, "").lower()
@@ -53,7 +66,7 @@ class PixiePlusConfigFlow(ConfigFlow, domain=DOMAIN):
             )
 
             try:
-                await pixieplus_cloud.login()
+                home_object = await pixieplus_cloud.bootstrap()
             except Exception as e:
                 _LOGGER.error("Can not login to Pixie Plus Cloud [%s]", e)
                 errors[CONF_PASSWORD] = "cannot_connect"
@@ -70,53 +83,7 @@ class PixiePlusConfigFlow(ConfigFlow, domain=DOMAIN):
                 errors=errors,
             )
 
-        devices = []
-        gateway = None
-        home_object = await pixieplus_cloud.home_object()
-        for device in home_object["deviceList"]:
-            _LOGGER.debug("Processing device - %s", device)
-            if CONF_DEVICE_ID not in device:
-                _LOGGER.warning("Skipped device, missing id - %s", device)
-                continue
-            if CONF_TYPE not in device:
-                _LOGGER.warning("Skipped device, missing type - %s", device)
-                continue
-            if device[CONF_TYPE] not in PIXIE_DEVICES_SPECS:
-                _LOGGER.warning("Skipped device, invalid type - %s", device["type"])
-                continue
-            if CONF_STYPE not in device:
-                _LOGGER.warning("Skipped device, missing stype - %s", device)
-                continue
-            if device[CONF_STYPE] not in PIXIE_DEVICES_SPECS[device[CONF_TYPE]]:
-                _LOGGER.warning("Skipped device, invalid stype - %s", device["stype"])
-                continue
-
-            if "version" not in device:
-                device[CONF_FIRMWARE] = "unknown"
-
-            ha_device = {
-                CONF_DEVICE_ID: device[CONF_DEVICE_ID],
-                CONF_DEVICE_NAME: device.get(
-                    CONF_DEVICE_NAME,
-                    f"{PIXIE_DEVICES_SPECS[device[CONF_TYPE]][device[CONF_STYPE]][CONF_MODEL]}-{device[CONF_DEVICE_ID]}",
-                ),
-                CONF_DEVICE_MAC: device[CONF_DEVICE_MAC],
-                CONF_TYPE: device[CONF_TYPE],
-                CONF_STYPE: device[CONF_STYPE],
-                CONF_MODEL: PIXIE_DEVICES_SPECS[device[CONF_TYPE]][device[CONF_STYPE]][
-                    CONF_MODEL
-                ],
-                CONF_MANUFACTURER: PIXIE_DEVICES_SPECS[device[CONF_TYPE]][
-                    device[CONF_STYPE]
-                ][CONF_MANUFACTURER],
-                CONF_FIRMWARE: device["version"],
-            }
-
-            if device[CONF_TYPE] == 1 and device[CONF_STYPE] == 2:
-                gateway = ha_device
-                gateway[CONF_DEVICE_NAME] = device[CONF_BRIDGE_NAME]
-            else:
-                devices.append(ha_device)
+        devices, gateway = home_devices(home_object)
 
         if len(devices) == 0 and gateway is None:
             return self.async_abort(reason="no_devices_found")
@@ -126,3 +93,47 @@ class PixiePlusConfigFlow(ConfigFlow, domain=DOMAIN):
         data[CONF_GATEWAY] = gateway
 
         return self.async_create_entry(title=f"{home_object['name']}", data=data)
+
+
+class PixiePlusOptionsFlow(OptionsFlow):
+    """Tune command batching, rate limits and push health checks."""
+
+    def __init__(self, config_entry: ConfigEntry):
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input: Optional[Mapping] = None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self._entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_COMMAND_BATCH_WINDOW,
+                        default=options.get(
+                            CONF_COMMAND_BATCH_WINDOW, DEFAULT_COMMAND_BATCH_WINDOW
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+                    vol.Required(
+                        CONF_GATEWAY_RATE,
+                        default=options.get(CONF_GATEWAY_RATE, DEFAULT_GATEWAY_RATE),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=1, max=100)),
+                    vol.Required(
+                        CONF_GATEWAY_BURST,
+                        default=options.get(CONF_GATEWAY_BURST, DEFAULT_GATEWAY_BURST),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+                    vol.Required(
+                        CONF_STALE_TIMEOUT,
+                        default=options.get(CONF_STALE_TIMEOUT, DEFAULT_STALE_TIMEOUT),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=15, max=600)),
+                    vol.Required(
+                        CONF_MIN_WRITE_INTERVAL,
+                        default=options.get(
+                            CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+                }
+            ),
+        )
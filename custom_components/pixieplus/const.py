@@ -29,6 +29,26 @@ CONF_USB = "usb"
 CONF_CCT_LIGHT = "cct_light"
 CONF_RGB_LIGHT = "rgb_light"
 CONF_EFFECTS = "effects"
+CONF_COMMAND_BATCH_WINDOW = "command_batch_window"
+CONF_GATEWAY_RATE = "gateway_rate"
+CONF_GATEWAY_BURST = "gateway_burst"
+CONF_STALE_TIMEOUT = "stale_timeout"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+
+DEFAULT_COMMAND_BATCH_WINDOW = 0.05
+DEFAULT_GATEWAY_RATE = 10
+DEFAULT_GATEWAY_BURST = 30
+DEFAULT_LOW_PRIORITY_DEADLINE = 5
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_MAX_POLL_INTERVAL = 120
+DEFAULT_STALE_TIMEOUT = 90
+DEFAULT_MIN_WRITE_INTERVAL = 0.5
+
+STATUS_STORAGE_VERSION = 1
+STATUS_SAVE_DELAY = 30
+
+STATUS_BRIGHTNESS = "br"
+STATUS_HUE = "hue"
 
 CMD_ON = "on"
 CMD_OFF = "off"
@@ -0,0 +1,19 @@
+"""Diagnostics support for Pixie Plus."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    handler = hass.data[DOMAIN][entry.entry_id]
+
+    return {"metrics": handler.metrics()}
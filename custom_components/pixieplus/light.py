@@ -2,9 +2,10 @@
 
 from __future__ import annotations
 
-import colorsys
+import asyncio
 import logging
 
+from .color_utils import br_to_brightness, brightness_to_br, hue_to_rgb
 from .pixieplus_handler import PixiePlusHandler
 from typing import Any
 
@@ -35,16 +36,10 @@ from .const import (
     CONF_DEVICE_MAC,
     CONF_TYPE,
     CONF_STYPE,
-    CONF_MODEL,
-    CONF_MANUFACTURER,
     CONF_FIRMWARE,
     CONF_GATEWAY,
-    CONF_LIGHT_SWITCH,
-    CONF_LIGHT_DIMMER,
-    CONF_RGB_LIGHT,
-    CONF_CCT_LIGHT,
-    PIXIE_DEVICES_SPECS,
 )
+from .pixieplus_devices import device_capabilities
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -56,15 +51,13 @@ async def async_setup_entry(
 
     handler = hass.data[DOMAIN][entry.entry_id]
     lights = []
-    for index, device in enumerate(entry.data[CONF_DEVICES]):
-        device_specs = PIXIE_DEVICES_SPECS[device[CONF_TYPE]][device[CONF_STYPE]]
+    for device in entry.data[CONF_DEVICES]:
         # Skip non lights
-        if device_specs[CONF_LIGHT_SWITCH] is False:
+        if not device_capabilities(device[CONF_TYPE], device[CONF_STYPE]).light:
             continue
 
         light = PixieLight(
             handler,
-            index,
             device[CONF_DEVICE_MAC],
             device[CONF_DEVICE_ID],
             device[CONF_DEVICE_NAME],
@@ -89,22 +82,12 @@ async def async_setup_entry(
     async_add_entities(lights)
 
 
-def convert_value_to_available_range(value, min_from, max_from, min_to, max_to) -> int:
-    normalized = (value - min_from) / (max_from - min_from)
-    new_value = min(
-        round((normalized * (max_to - min_to)) + min_to),
-        max_to,
-    )
-    return max(new_value, min_to)
-
-
 class PixieLight(CoordinatorEntity, LightEntity):
     """Representation of an Awesome Light."""
 
     def __init__(
         self,
         coordinator: PixiePlusHandler,
-        idx: int,
         mac: str,
         device_id: int,
         name: str,
@@ -114,8 +97,7 @@ class PixieLight(CoordinatorEntity, LightEntity):
         gateway: dict,
     ):
         """Initialize an PixiePlus Light."""
-        super().__init__(coordinator)
-        self.idx = idx
+        super().__init__(coordinator, context=device_id)
         self._handler = coordinator
         self._mac = mac
         self._device_id = device_id
@@ -130,7 +112,16 @@ class PixieLight(CoordinatorEntity, LightEntity):
         self._firmware = firmware
         self._device_type = device_type
         self._device_stype = device_stype
-        self._device_specs = PIXIE_DEVICES_SPECS[device_type][device_stype]
+        # Shared by every light of this model, read on each state write
+        self._capabilities = device_capabilities(device_type, device_stype)
+        self._device_info = DeviceInfo(
+            identifiers={(DOMAIN, self._attr_unique_id)},
+            name=name,
+            manufacturer=self._capabilities.manufacturer,
+            model=self._capabilities.model,
+            sw_version=f"{self._firmware}",
+            via_device=(DOMAIN, f"salpixiegateway-{self._gateway[CONF_DEVICE_ID]}"),
+        )
 
         self._state = None
         self._red = None
@@ -143,14 +134,7 @@ class PixieLight(CoordinatorEntity, LightEntity):
     @property
     def device_info(self) -> DeviceInfo:
         """Get device info."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self.unique_id)},
-            name=self.name,
-            manufacturer=self._device_specs[CONF_MANUFACTURER],
-            model=self._device_specs[CONF_MODEL],
-            sw_version=f"{self._firmware}",
-            via_device=(DOMAIN, f"salpixiegateway-{self._gateway[CONF_DEVICE_ID]}"),
-        )
+        return self._device_info
 
     @property
     def available(self) -> bool:
@@ -190,27 +174,21 @@ class PixieLight(CoordinatorEntity, LightEntity):
         return bool(self._state)
 
     @property
-    def supported_color_modes(self) -> set[ColorMode] | None:
-        supported_color_modes = set()
-        if self._device_specs[CONF_CCT_LIGHT]:
-            supported_color_modes.add(ColorMode.COLOR_TEMP)
-        if self._device_specs[CONF_RGB_LIGHT]:
-            supported_color_modes.add(ColorMode.RGB)
-        if len(supported_color_modes) == 0 and self._device_specs[CONF_LIGHT_DIMMER]:
-            supported_color_modes.add(ColorMode.BRIGHTNESS)
-        if len(supported_color_modes) == 0:
-            supported_color_modes.add(ColorMode.ONOFF)
-        return supported_color_modes
+    def supported_color_modes(self) -> frozenset[ColorMode] | None:
+        return self._capabilities.color_modes
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Instruct the light to turn on."""
         status = {}
+        commands = []
 
         _LOGGER.debug("[%s] Turn on %s", self.unique_id, kwargs)
 
         if ATTR_RGB_COLOR in kwargs:
             rgb = kwargs[ATTR_RGB_COLOR]
-            await self._handler.async_set_color(self._device_id, rgb[0], rgb[1], rgb[2])
+            commands.append(
+                self._handler.async_set_color(self._device_id, rgb[0], rgb[1], rgb[2])
+            )
             status["red"] = rgb[0]
             status["green"] = rgb[1]
             status["blue"] = rgb[2]
@@ -220,38 +198,46 @@ class PixieLight(CoordinatorEntity, LightEntity):
             status["state"] = True
             if self.color_mode != ColorMode.RGB:
                 device_brightness = kwargs[ATTR_BRIGHTNESS]
-                await self._handler.async_set_white_brightness(
-                    self._device_type,
-                    self._device_stype,
-                    self._device_id,
-                    device_brightness,
+                commands.append(
+                    self._handler.async_set_white_brightness(
+                        self._device_type,
+                        self._device_stype,
+                        self._device_id,
+                        brightness_to_br(device_brightness),
+                    )
                 )
                 status["white_brightness"] = device_brightness
             else:
                 device_brightness = kwargs[ATTR_BRIGHTNESS]
-                await self._handler.async_set_color_brightness(
-                    self._device_id, device_brightness
+                commands.append(
+                    self._handler.async_set_color_brightness(
+                        self._device_id, device_brightness
+                    )
                 )
                 status["color_brightness"] = device_brightness
 
         if "state" not in status:
-            await self._handler.async_on(
-                self._device_type, self._device_stype, self._device_id
+            commands.append(
+                self._handler.async_on(
+                    self._device_type, self._device_stype, self._device_id
+                )
             )
             status["state"] = True
 
-        self.status_callback(status)
+        # Optimistic state first, the handler may hold debounced commands back
+        self.status_callback(status, immediate=True)
+        await asyncio.gather(*commands)
 
     async def async_turn_off(self, **kwargs):
         """Instruct the light to turn off."""
         _LOGGER.debug("[%s] turn off", self.unique_id)
+        self.status_callback({"state": False}, immediate=True)
         await self._handler.async_off(
             self._device_type, self._device_stype, self._device_id
         )
-        self.status_callback({"state": False})
 
     @callback
-    def status_callback(self, status) -> None:
+    def status_callback(self, status, immediate: bool = False) -> None:
         if "state" in status:
             self._state = status["state"]
         if "white_brightness" in status:
@@ -280,46 +266,59 @@ class PixieLight(CoordinatorEntity, LightEntity):
             status,
         )
 
-        self.hass.loop.call_soon_threadsafe(self.async_write_ha_state)
+        # Statuses are merged into the attributes above, the write itself is
+        # coalesced with any others for this light
+        self._handler.entity_writes.async_request_write(
+            self.unique_id, self._visible_state, self.async_write_ha_state, immediate
+        )
+
+    def _visible_state(self):
+        return (self._state, self.brightness, self.rgb_color, self._attr_color_mode)
+
+    async def async_added_to_hass(self) -> None:
+        """Start from the handler's last known status, if it has one."""
+        await super().async_added_to_hass()
+        if self.coordinator.data is not None:
+            self._handle_coordinator_update()
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        self._handler.entity_writes.async_forget(self.unique_id)
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
 
-        device = self.coordinator.data[self.idx]
-        _LOGGER.info("Updating Light Status: %s", device)
+        device = self.coordinator.data.get(self._device_id)
+        if device is None or not device.known:
+            return
+        _LOGGER.info(
+            "Updating Light Status: %s br=%s hue=%s",
+            self._device_id,
+            device.br,
+            device.hue,
+        )
         new_status = {}
 
-        if self._device_specs[CONF_RGB_LIGHT]:
+        if self._capabilities.rgb:
             new_status["color_mode"] = True
-            hue_val = device["status"]["hue"]
-            if hue_val > 360:
-                new_status["red"] = 255
-                new_status["green"] = 255
-                new_status["blue"] = 255
-            else:
-                rgb_color = colorsys.hsv_to_rgb(hue_val / 360, 1, 1)
-                new_status["red"] = rgb_color[0] * 255
-                new_status["green"] = rgb_color[1] * 255
-                new_status["blue"] = rgb_color[2] * 255
+            red, green, blue = hue_to_rgb(device.hue)
+            new_status["red"] = red
+            new_status["green"] = green
+            new_status["blue"] = blue
 
-        if self._device_specs[CONF_LIGHT_DIMMER]:
+        if self._capabilities.dimmer:
+            device_brightness = br_to_brightness(device.br)
             if self.color_mode != ColorMode.RGB:
-                device_brightness = convert_value_to_available_range(
-                    device["status"]["br"], 0, 100, 0, 255
-                )
                 new_status["white_brightness"] = device_brightness
-                if device["status"]["br"] > 0:
+                if device.br > 0:
                     self._attr_color_mode = ColorMode.BRIGHTNESS
             else:
-                device_brightness = convert_value_to_available_range(
-                    device["status"]["br"], 0, 100, 0, 255
-                )
                 new_status["color_brightness"] = device_brightness
         else:
             self._attr_color_mode = ColorMode.ONOFF
 
-        if device["status"]["br"] > 0:
+        if device.br > 0:
             new_status["state"] = True
         else:
             new_status["state"] = False
@@ -0,0 +1,93 @@
+"""Bridge between PixiePlus Cloud messages and the handler"""
+
+from collections import deque
+import logging
+import threading
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 100
+
+
+class PixiePlusUpdateBridge:
+    """Hands cloud messages to the event loop, keeping only the newest snapshot
+    of each coalesced object.
+
+    submit() can be called from any thread. Delivery always happens on the
+    loop, at most once per loop iteration.
+    """
+
+    def __init__(
+        self,
+        loop,
+        dispatch,
+        coalesce_classes=("Home",),
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        """
+        Args :
+            loop: The event loop messages are delivered on
+            dispatch: Called on the loop with (class_name, class_object)
+            coalesce_classes: Classes for which only the newest snapshot per
+                objectId is delivered
+            max_pending: Maximum number of queued messages of other classes
+        """
+        self._loop = loop
+        self._dispatch = dispatch
+        self._coalesce_classes = frozenset(coalesce_classes)
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._messages = deque(maxlen=max_pending)
+        self._scheduled = False
+
+        self._received = 0
+        self._delivered = 0
+        self._coalesced = 0
+        self._dropped = 0
+
+    def submit(self, class_name: str, class_object: dict):
+        with self._lock:
+            self._received += 1
+            if class_name in self._coalesce_classes:
+                key = (class_name, class_object.get("objectId", None))
+                if key in self._snapshots:
+                    self._coalesced += 1
+                self._snapshots[key] = class_object
+            else:
+                if len(self._messages) == self._messages.maxlen:
+                    self._dropped += 1
+                self._messages.append((class_name, class_object))
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        self._loop.call_soon_threadsafe(self._flush)
+
+    def _flush(self):
+        with self._lock:
+            snapshots = self._snapshots
+            messages = self._messages
+            self._snapshots = {}
+            self._messages = deque(maxlen=messages.maxlen)
+            self._scheduled = False
+
+        for (class_name, _), class_object in snapshots.items():
+            self._deliver(class_name, class_object)
+        for class_name, class_object in messages:
+            self._deliver(class_name, class_object)
+
+    def _deliver(self, class_name: str, class_object: dict):
+        self._delivered += 1
+        try:
+            self._dispatch(class_name, class_object)
+        except Exception:
+            _LOGGER.exception("Error handling %s update", class_name)
+
+    def metrics(self) -> dict:
+        return {
+            "received": self._received,
+            "delivered": self._delivered,
+            "coalesced": self._coalesced,
+            "dropped": self._dropped,
+        }
@@ -1,10 +1,23 @@
 """Pixie Plus Cloud API"""
 
-import websocket
+import asyncio
+from datetime import datetime, timezone
+from functools import partial
+import importlib.util
 import json
 import uuid
 import logging
+import random
 import time
+from urllib.parse import urlparse
+
+import aiohttp
+import httpx
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
 from .const import (
@@ -13,99 +26,314 @@ from .const import (
     CONF_USER_OBJECT_ID,
     CONF_CURRENT_HOME_ID,
     CONF_LIVE_GROUP_ID,
+    DEFAULT_STALE_TIMEOUT,
 )
+from .pixieplus_metrics import LatencyHistogram, to_ms
 
 PIXIE_PLUS_CLOUD_URL = "https://www.pixie.app/p0/pixieCloud/"
 PIXIE_PLUS_CLOUD_WS_URL = "wss://www.pixie.app/ws/p0/pixieCloud"
 PIXIE_PLUS_CLOUD_APPLICATION_ID = "6426f04c206c108275ede71b9fd09ac8"
 PIXIE_PLUS_CLOUD_CLIENT_KEY = "35779bd411c751ff87577cd762118dad"
+PIXIE_PLUS_CLOUD_WS_RECONNECT_DELAY = 1
+PIXIE_PLUS_CLOUD_WS_MAX_RECONNECT_DELAY = 300
+PIXIE_PLUS_CLOUD_MAX_BATCH_SIZE = 50
+PIXIE_PLUS_CLOUD_KEEP_ALIVE_INTERVAL = 45
+PIXIE_PLUS_CLOUD_KEEP_ALIVE_EXPIRY = 120
+
+# HTTP/2 needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Home fields needed to refresh device status. Parse always adds objectId,
+# createdAt and updatedAt (and className on LiveQuery pushes).
+HOME_STATUS_KEYS = ("onlineList",)
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class PixiePlusCloud:
-    def __init__(
-        self,
-        httpx_client,
-        username: str,
-        password: str,
-        installation_id: str = "",
-        user_object_id: str = "",
-        session_token: str = "",
-        current_home_id: str = "",
-        live_group_id: str = "",
-    ):
-        self._httpx_client = httpx_client
-        self._username = username
-        self._password = password
-        self._installation_id = installation_id
-        self._user_object_id = user_object_id
-        self._session_token = session_token
-        self._current_home_id = current_home_id
-        self._live_group_id = live_group_id
+# JSON codec for every request and message. orjson ships with Home Assistant
+# and is several times faster than the stdlib on Home payloads.
+if orjson is not None:
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+else:
 
-        self._pixieplus_ws_conn = None
-        self._pixieplus_ws_listeners = {}
-        self._pixieplus_ws_connected = False
-        self._pixieplus_ws_client_id = ""
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
 
-        if not self._installation_id:
-            self._installation_id = str(uuid.uuid4())
+    json_loads = json.loads
 
-    async def login(self):
-        payload = json.dumps(
-            {"username": self._username, "password": self._password, "_method": "GET"}
-        )
 
-        headers = {
-            "x-parse-application-id": PIXIE_PLUS_CLOUD_APPLICATION_ID,
-            "x-parse-installation-id": self._installation_id,
-            "x-parse-client-key": PIXIE_PLUS_CLOUD_CLIENT_KEY,
-            "content-type": "application/json",
-        }
+def reconnect_delay(attempt: int) -> float:
+    """Seconds to wait before reconnect attempt `attempt`, counted from 0.
 
-        response = await self._httpx_client.request(
-            "POST", PIXIE_PLUS_CLOUD_URL + "login", headers=headers, data=payload
-        )
+    The delay doubles with each failed attempt. Half of it is random so
+    that every installation that lost the server at the same moment does
+    not come back at the same moment too.
+    """
+    delay = min(
+        PIXIE_PLUS_CLOUD_WS_MAX_RECONNECT_DELAY,
+        PIXIE_PLUS_CLOUD_WS_RECONNECT_DELAY * 2 ** min(attempt, 16),
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
 
-        if response.status_code != 200:
-            raise Exception("Login failed - %s" % response.json()["error"])
-
-        self._user_object_id = response.json()["objectId"]
-        self._session_token = response.json()["sessionToken"]
-        self._current_home_id = (
-            response.json()["curHome"]["objectId"]
-            if "curHome" in response.json()
-            else self._current_home_id
-        )
 
-        # Initialise required Ids
-        await self.currentHomeId()
-        await self.liveGroupId()
+def create_http_client(ssl_context) -> httpx.AsyncClient:
+    """Create the long-lived HTTP client for one Pixie Plus account.
 
-    def connect_ws(self, ssl_context):
-        websocket.enableTrace(False)
+    Idle connections outlive the keep-alive interval, so the periodic
+    keep-alive finds the connection open and a command never waits for a
+    TLS handshake.
+    """
+    return httpx.AsyncClient(
+        verify=ssl_context,
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(keepalive_expiry=PIXIE_PLUS_CLOUD_KEEP_ALIVE_EXPIRY),
+    )
+
+
+def _parse_date(value: datetime) -> dict:
+    """Encode a datetime as a Parse Date."""
+    iso = value.astimezone(timezone.utc).isoformat(timespec="milliseconds")
+    return {"__type": "Date", "iso": iso.replace("+00:00", "Z")}
+
+
+def _response_json(response):
+    """Decode a Parse response body once."""
+    return json_loads(response.content)
 
-        self._pixieplus_ws_conn = websocket.WebSocketApp(
-            PIXIE_PLUS_CLOUD_WS_URL,
-            header={},
-            on_open=self._on_ws_open,
-            on_message=self._on_ws_message,
-            on_error=self._on_ws_error,
-            on_close=self._on_ws_close,
-        )
-        return self._pixieplus_ws_conn.run_forever(
-            sslopt={"context": ssl_context}, reconnect=5
-        )
 
-    def close_ws(self):
-        if self._pixieplus_ws_conn is not None:
-            self._pixieplus_ws_connected = False
-            self._pixieplus_ws_conn.close()
+class PixiePlusLiveQuery:
+    """Parse LiveQuery client running on the Home Assistant event loop."""
 
-    def _on_ws_open(self, ws):
+    def __init__(
+        self,
+        websession: aiohttp.ClientSession,
+        session_token: str = "",
+        stale_timeout: float = DEFAULT_STALE_TIMEOUT,
+    ):
+        """
+        Args :
+            websession: aiohttp session the socket is opened with
+            session_token: Parse session token sent with connect and subscribe
+            stale_timeout: Seconds of silence after which the socket is
+                considered dead and reconnected. Pings go out three times
+                per timeout so a live server always answers in time.
+        """
+        self._websession = websession
+        self._session_token = session_token
+        self._stale_timeout = stale_timeout
+        self._heartbeat_interval = stale_timeout / 3
+
+        self._ws = None
+        self._closing = False
+        self._client_id = ""
+        self._subscriptions = {}
+        self._callbacks = {}
+        self._next_request_id = 1
+        self._pending_sends = set()
+        self._connection_listeners = []
+        self._unacknowledged = set()
+        self._healthy = False
+
+        self._last_message_at = None
+        self._ping_sent_at = None
+        self._rtt = LatencyHistogram()
+        self._connects = 0
+        self._stale_reconnects = 0
+        self._failed_attempts = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed and bool(self._client_id)
+
+    @property
+    def healthy(self) -> bool:
+        """True once the server has acknowledged every subscription."""
+        return self._healthy
+
+    def add_connection_listener(self, callback):
+        """Call callback(healthy) whenever push updates start or stop.
+
+        A listener added to a socket that is already healthy is told so at
+        once. Returns a function that removes the listener.
+        """
+        if callback not in self._connection_listeners:
+            self._connection_listeners.append(callback)
+            if self._healthy:
+                callback(True)
+
+        def remove_listener():
+            if callback in self._connection_listeners:
+                self._connection_listeners.remove(callback)
+
+        return remove_listener
+
+    def _set_healthy(self, healthy: bool):
+        if healthy == self._healthy:
+            return
+        self._healthy = healthy
+        if healthy:
+            self._failed_attempts = 0
+        if self._closing:
+            return
+        for callback in self._connection_listeners:
+            callback(healthy)
+
+    def set_session_token(self, session_token: str):
+        self._session_token = session_token
+
+    def set_stale_timeout(self, stale_timeout: float):
+        """Change the stale timeout, from the next heartbeat on."""
+        self._stale_timeout = stale_timeout
+        self._heartbeat_interval = stale_timeout / 3
+
+    async def async_subscribe(
+        self, class_name: str, where: dict, callback, fields=None
+    ):
+        """Pass every update to the matching objects to callback.
+
+        Subscriptions are replayed after each reconnect. Several homes can
+        share one socket since updates are routed by the request id the
+        server tags them with. Returns a function that unsubscribes.
+
+        Args :
+            class_name: Parse class to watch
+            where: Parse query selecting the objects to watch
+            callback: Called with each updated object
+            fields: Only push these fields of the object, all if None
+        """
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        query = {"className": class_name, "where": where}
+        if fields:
+            query["fields"] = list(fields)
+        self._subscriptions[request_id] = query
+        self._callbacks[request_id] = callback
+        if self.connected:
+            await self._ws_subscribe_class(self._ws, request_id, query)
+        return partial(self._unsubscribe, request_id)
+
+    def _unsubscribe(self, request_id: int):
+        if self._subscriptions.pop(request_id, None) is None:
+            return
+        del self._callbacks[request_id]
+        self._unacknowledged.discard(request_id)
+        if self.connected:
+            task = asyncio.get_running_loop().create_task(
+                self._ws_unsubscribe(self._ws, request_id)
+            )
+            self._pending_sends.add(task)
+            task.add_done_callback(self._pending_sends.discard)
+
+    async def async_run(self, ssl_context=None):
+        """Keep the LiveQuery socket connected until async_close is called."""
+        self._closing = False
+        while not self._closing:
+            try:
+                # Pings are ours, so pongs must reach the receive loop
+                async with self._websession.ws_connect(
+                    PIXIE_PLUS_CLOUD_WS_URL, ssl=ssl_context, autoping=False
+                ) as ws:
+                    self._ws = ws
+                    self._connects += 1
+                    self._last_message_at = time.monotonic()
+                    heartbeat = asyncio.create_task(self._async_heartbeat(ws))
+                    try:
+                        await self._on_open(ws)
+                        await self._async_receive(ws)
+                    finally:
+                        heartbeat.cancel()
+                    _LOGGER.info("WebSocket closed: %s", ws.close_code)
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                ConnectionResetError,
+            ) as e:
+                _LOGGER.error("WebSocket error: %s", e)
+            except Exception:
+                # Anything else would end this task and leave the entry polling
+                _LOGGER.exception("Unexpected PixiePlus WebSocket error")
+            finally:
+                self._ws = None
+                self._client_id = ""
+                self._ping_sent_at = None
+                self._set_healthy(False)
+
+            if not self._closing:
+                delay = reconnect_delay(self._failed_attempts)
+                self._failed_attempts += 1
+                _LOGGER.debug("Reconnecting WebSocket in %.1f seconds", delay)
+                await asyncio.sleep(delay)
+
+    async def _async_receive(self, ws):
+        async for message in ws:
+            self._last_message_at = time.monotonic()
+            if message.type == aiohttp.WSMsgType.TEXT:
+                try:
+                    await self._on_message(ws, message.data)
+                except (aiohttp.ClientError, ConnectionResetError):
+                    raise
+                except Exception:
+                    # One bad frame must not take the socket down with it
+                    _LOGGER.exception(
+                        "Ignoring PixiePlus WebSocket message: %.200s", message.data
+                    )
+            elif message.type == aiohttp.WSMsgType.PONG:
+                if self._ping_sent_at is not None:
+                    self._rtt.add(self._last_message_at - self._ping_sent_at)
+                    self._ping_sent_at = None
+            elif message.type == aiohttp.WSMsgType.PING:
+                await ws.pong(message.data)
+            elif message.type == aiohttp.WSMsgType.ERROR:
+                _LOGGER.error("WebSocket error: %s", ws.exception())
+                break
+
+    async def _async_heartbeat(self, ws):
+        """Ping the server and drop the socket once it has gone silent.
+
+        A half-open TCP connection never errors on its own, so silence is
+        the only sign that the server is gone.
+        """
+        while not ws.closed:
+            await asyncio.sleep(self._heartbeat_interval)
+            silence = time.monotonic() - self._last_message_at
+            if silence > self._stale_timeout:
+                _LOGGER.warning(
+                    "PixiePlus WebSocket silent for %.0f seconds, reconnecting",
+                    silence,
+                )
+                self._stale_reconnects += 1
+                await ws.close()
+                return
+            if self._ping_sent_at is None:
+                self._ping_sent_at = time.monotonic()
+            try:
+                await ws.ping()
+            except ConnectionResetError:
+                return
+
+    def metrics(self) -> dict:
+        return {
+            "connected": self.connected,
+            "healthy": self._healthy,
+            "connects": self._connects,
+            "stale_reconnects": self._stale_reconnects,
+            "rtt": self._rtt.as_ms(),
+            "since_last_message_ms": (
+                to_ms(time.monotonic() - self._last_message_at)
+                if self._last_message_at is not None
+                else None
+            ),
+        }
+
+    async def async_close(self):
+        self._closing = True
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _on_open(self, ws):
         _LOGGER.info("Opened connection to PixiePlus WebSocket endpoint")
-        payload = json.dumps(
+        payload = json_dumps(
             {
                 "op": "connect",
                 "applicationId": PIXIE_PLUS_CLOUD_APPLICATION_ID,
@@ -113,113 +341,325 @@ class PixiePlusCloud:
                 "clientKey": PIXIE_PLUS_CLOUD_CLIENT_KEY,
             }
         )
-        ws.send(payload)
+        await ws.send_str(payload.decode())
 
-    def _on_ws_message(self, ws, message: str):
-        message_data = json.loads(message)
+    async def _on_message(self, ws, message: str):
+        message_data = json_loads(message)
         opcode = message_data.get("op", None)
         clientId = message_data.get("clientId", "")
         classObject = message_data.get("object", None)
 
         if opcode == "connected" and clientId is not None:
             _LOGGER.info("Connected to PixiePlus Cloud WebSocket")
-            self._pixieplus_ws_client_id = clientId
-            self._subscribe_home_updates(ws)
-            self._subscribe_live_group_updates(ws)
-            self._subscribe_hp_updates(ws)
+            self._client_id = clientId
+            self._unacknowledged = set(self._subscriptions)
+            # Write every subscribe at once and collect the acks as they come
+            await asyncio.gather(
+                *(
+                    self._ws_subscribe_class(ws, request_id, query)
+                    for request_id, query in self._subscriptions.items()
+                )
+            )
             return
-        if opcode == "subscribed" and clientId == self._pixieplus_ws_client_id:
+        if opcode == "subscribed" and clientId == self._client_id:
             _LOGGER.info(
                 "Subscribed to PixiePlus Cloud Class Updates: %s", message_data
             )
+            self._unacknowledged.discard(message_data.get("requestId", None))
+            if not self._unacknowledged:
+                self._set_healthy(True)
             return
         if opcode == "update":
             _LOGGER.info("Received update message")
-            if classObject is not None:
-                className = classObject.get("className", None)
-                if (
-                    className is not None
-                    and self._pixieplus_ws_client_id
-                    == message_data.get("clientId", None)
-                ):
-                    if className in self._pixieplus_ws_listeners:
-                        for callback in self._pixieplus_ws_listeners[className]:
-                            callback(classObject)
+            if classObject is not None and self._client_id == clientId:
+                callback = self._callbacks.get(message_data.get("requestId", None))
+                if callback is not None:
+                    callback(classObject)
             return
 
         _LOGGER.info("Received message with unknown opcode %s", message)
 
-    def _on_ws_error(self, ws, error: str):
-        _LOGGER.error("WebSocket error: %s", error)
-
-    def _on_ws_close(self, ws, close_status_code: int, close_msg: str):
-        _LOGGER.info("WebSocket closed: %s - %s", close_status_code, close_msg)
+    async def _ws_unsubscribe(self, ws, request_id: int):
+        payload = json_dumps({"op": "unsubscribe", "requestId": request_id})
+        try:
+            await ws.send_str(payload.decode())
+        except ConnectionResetError:
+            # The subscription dies with the socket anyway
+            pass
 
-    def _ws_subscribe_class(
-        self, ws, request_id, class_name: str, where_value: dict = {}
-    ):
-        payload = json.dumps(
+    async def _ws_subscribe_class(self, ws, request_id: int, query: dict):
+        payload = json_dumps(
             {
                 "op": "subscribe",
-                "query": {"className": class_name, "where": where_value},
+                "query": query,
                 "requestId": request_id,
                 "sessionToken": self._session_token,
             }
         )
-        ws.send(payload)
+        await ws.send_str(payload.decode())
+
+
+class PixiePlusCloud:
+    def __init__(
+        self,
+        httpx_client,
+        username: str,
+        password: str,
+        installation_id: str = "",
+        user_object_id: str = "",
+        session_token: str = "",
+        current_home_id: str = "",
+        live_group_id: str = "",
+        latency_tracker=None,
+        live_query: PixiePlusLiveQuery = None,
+    ):
+        self._httpx_client = httpx_client
+        self._username = username
+        self._password = password
+        self._installation_id = installation_id or str(uuid.uuid4())
+        self._user_object_id = user_object_id
+        self._current_home_id = current_home_id
+
+        # Built once, every request reuses them
+        self._url = PIXIE_PLUS_CLOUD_URL
+        self._mount_path = urlparse(self._url).path
+        self._headers = {
+            "x-parse-application-id": PIXIE_PLUS_CLOUD_APPLICATION_ID,
+            "x-parse-installation-id": self._installation_id,
+            "x-parse-client-key": PIXIE_PLUS_CLOUD_CLIENT_KEY,
+            "content-type": "application/json",
+        }
+        self._set_session_token(session_token)
+        self._set_live_group_id(live_group_id)
+
+        # Owned by the account's shared connection, REST only without one
+        self._live_query = live_query
+        self._update_listeners = {"Home": [], "LiveGroup": [], "HP": []}
+        self._latency_tracker = latency_tracker
+
+        self._last_request_at = None
+        self._last_request_time = 0
+        self._keep_alives = 0
+        self._http_version = None
+
+    def _set_session_token(self, session_token: str):
+        self._session_token = session_token
+        self._session_headers = {
+            **self._headers,
+            "x-parse-session-token": session_token,
+        }
+
+    def _set_live_group_id(self, live_group_id: str):
+        self._live_group_id = live_group_id
+        self._live_group_path = self._mount_path + "classes/LiveGroup/" + live_group_id
+        self._live_group_url = self._url + "classes/LiveGroup/" + live_group_id
+
+    async def login(self):
+        await self._login()
+
+        # Initialise required Ids
+        await self.currentHomeId()
+        await self.liveGroupId()
+
+    async def _login(self):
+        payload = json_dumps(
+            {"username": self._username, "password": self._password, "_method": "GET"}
+        )
+
+        response = await self._httpx_client.request(
+            "POST", self._url + "login", headers=self._headers, content=payload
+        )
+        user = _response_json(response)
+
+        if response.status_code != 200:
+            raise Exception("Login failed - %s" % user["error"])
+
+        self._user_object_id = user["objectId"]
+        self._set_session_token(user["sessionToken"])
+        # An account can have several homes, keep the one this entry is for
+        if not self._current_home_id and "curHome" in user:
+            self._current_home_id = user["curHome"]["objectId"]
+
+    async def bootstrap(self):
+        """Log in and load the Home object and LiveGroup id in one batch.
+
+        Replaces login() followed by home_object(), which took three serial
+        round trips. Returns the Home object.
+        """
+        await self._login()
+
+        queries = [("Home", {"where": {}})]
+        if self._current_home_id:
+            queries[0] = ("Home", {"where": {"objectId": self._current_home_id}})
+            if not self._live_group_id:
+                queries.append(
+                    ("LiveGroup", self._live_group_query(self._current_home_id))
+                )
+
+        results = await self._batch_fetch(queries)
+
+        home_object = results[0][0]
+        self._current_home_id = home_object["objectId"]
+        if len(results) > 1:
+            self._set_live_group_id(results[1][0]["objectId"])
+        # Only needs a round trip of its own if login did not return a home
+        await self.liveGroupId()
+
+        return home_object
 
-    def _subscribe_home_updates(self, ws):
-        self._ws_subscribe_class(ws, 2, "Home", {"objectId": self._current_home_id})
+    @property
+    def session_token(self) -> str:
+        return self._session_token
 
-    def _subscribe_live_group_updates(self, ws):
-        self._ws_subscribe_class(ws, 1, "LiveGroup", {"objectId": self._live_group_id})
+    async def async_start_session(self) -> bool:
+        """Reuse the stored session if the server still accepts it.
 
-    def _subscribe_hp_updates(self, ws):
-        self._ws_subscribe_class(
-            ws,
-            3,
-            "HP",
-            {"homeId": self._current_home_id, "userId": self._user_object_id},
+        Falls back to a full login when there is no stored session or the
+        server rejects the token. Returns True if a new login was needed.
+        """
+        if not (
+            self._session_token
+            and self._user_object_id
+            and self._current_home_id
+            and self._live_group_id
+        ):
+            await self.login()
+            return True
+
+        response = await self._httpx_client.request(
+            "GET", self._url + "users/me", headers=self._session_headers
         )
+        if response.status_code == 200:
+            _LOGGER.debug("Reusing stored PixiePlus session")
+            self._last_request_at = time.monotonic()
+            return False
+
+        if response.status_code >= 500:
+            raise Exception("Session check failed - %s" % response.status_code)
 
-    def _subscribe_class_update_listener(self, class_name: str, callback):
-        if class_name not in self._pixieplus_ws_listeners:
-            self._pixieplus_ws_listeners[class_name] = []
-        if callback not in self._pixieplus_ws_listeners[class_name]:
-            self._pixieplus_ws_listeners[class_name].append(callback)
+        _LOGGER.info("Stored PixiePlus session was rejected, logging in again")
+        await self.login()
+        return True
+
+    async def async_subscribe(self):
+        """Subscribe to this home's LiveGroup, Home and HP updates.
+
+        Returns a function that removes all three subscriptions.
+        """
+        unsubscribers = [
+            await self._live_query.async_subscribe(
+                "LiveGroup",
+                {"objectId": self._live_group_id},
+                partial(self._on_update, "LiveGroup"),
+            ),
+            await self._live_query.async_subscribe(
+                "Home",
+                {"objectId": self._current_home_id},
+                partial(self._on_update, "Home"),
+                HOME_STATUS_KEYS,
+            ),
+            await self._live_query.async_subscribe(
+                "HP",
+                {"homeId": self._current_home_id, "userId": self._user_object_id},
+                partial(self._on_update, "HP"),
+            ),
+        ]
+
+        def unsubscribe():
+            for unsubscriber in unsubscribers:
+                unsubscriber()
+
+        return unsubscribe
+
+    def _on_update(self, class_name, class_object):
+        for callback in self._update_listeners[class_name]:
+            callback(class_object)
+
+    def _add_update_listener(self, class_name, callback):
+        listeners = self._update_listeners[class_name]
+        listeners.append(callback)
+
+        def remove_listener():
+            if callback in listeners:
+                listeners.remove(callback)
+
+        return remove_listener
 
     def subscribe_home_updates(self, callback):
-        self._subscribe_class_update_listener("Home", callback)
+        return self._add_update_listener("Home", callback)
 
     def subscribe_live_group_updates(self, callback):
-        self._subscribe_class_update_listener("LiveGroup", callback)
+        return self._add_update_listener("LiveGroup", callback)
 
     def subscribe_hp_updates(self, callback):
-        self._subscribe_class_update_listener("HP", callback)
+        return self._add_update_listener("HP", callback)
+
+    def subscribe_connection_state(self, callback):
+        """Call callback(healthy) when push updates start or stop arriving."""
+        return self._live_query.add_connection_listener(callback)
 
     async def _fetch_class(
-        self, class_name: str, where: dict = {"where": {}, "_method": "GET"}
+        self,
+        class_name: str,
+        where: dict = {"where": {}, "_method": "GET"},
+        keys=None,
     ):
-        payload = json.dumps(where)
-        headers = {
-            "x-parse-application-id": PIXIE_PLUS_CLOUD_APPLICATION_ID,
-            "x-parse-installation-id": self._installation_id,
-            "x-parse-client-key": PIXIE_PLUS_CLOUD_CLIENT_KEY,
-            "content-type": "application/json",
-            "x-parse-session-token": self._session_token,
-        }
+        if keys:
+            where = {**where, "keys": ",".join(keys)}
+        payload = json_dumps(where)
 
         response = await self._httpx_client.request(
             "POST",
-            PIXIE_PLUS_CLOUD_URL + "classes/" + class_name,
-            headers=headers,
-            data=payload,
+            self._url + "classes/" + class_name,
+            headers=self._session_headers,
+            content=payload,
+        )
+        data = _response_json(response)
+
+        if response.status_code != 200:
+            raise Exception("Loading data failed - %s" % data["error"])
+
+        return data["results"]
+
+    async def _batch_fetch(self, queries):
+        """Run several class queries in one Parse batch request.
+
+        Args :
+            queries: List of (class_name, query) tuples
+        """
+        payload = json_dumps(
+            {
+                "requests": [
+                    {
+                        "method": "GET",
+                        "path": self._mount_path + "classes/" + class_name,
+                        "body": query,
+                    }
+                    for class_name, query in queries
+                ]
+            }
+        )
+
+        response = await self._httpx_client.request(
+            "POST", self._url + "batch", headers=self._session_headers, content=payload
         )
+        data = _response_json(response)
 
         if response.status_code != 200:
-            raise Exception("Loading data failed - %s" % response.json()["error"])
+            raise Exception("Loading data failed - %s" % data["error"])
 
-        return response.json()["results"]
+        results = []
+        for result in data:
+            if "error" in result:
+                raise Exception("Loading data failed - %s" % result["error"])
+            results.append(result["success"]["results"])
+        return results
+
+    def _live_group_query(self, home_id: str):
+        return {
+            "where": {"GroupID": {"$regex": home_id + "$", "$options": "i"}},
+            "limit": 2,
+        }
 
     async def userObjectId(self):
         if self._user_object_id is None or self._user_object_id == "":
@@ -239,49 +679,85 @@ class PixiePlusCloud:
         if self._live_group_id is None or self._live_group_id == "":
             results = await self._fetch_class(
                 "LiveGroup",
-                {
-                    "where": {
-                        "GroupID": {
-                            "$regex": await self.currentHomeId() + "$",
-                            "$options": "i",
-                        }
-                    },
-                    "limit": 2,
-                    "_method": "GET",
-                },
+                self._live_group_query(await self.currentHomeId()) | {"_method": "GET"},
             )
-            self._live_group_id = results[0]["objectId"]
+            self._set_live_group_id(results[0]["objectId"])
 
         return self._live_group_id
 
-    async def send_live_group_request(self, ble_data):
-        request_sent_time = int(time.time()) * 1000
-        payload = {
+    def _live_group_payload(self, ble_data, request_time):
+        return {
             "Cmd": 2,
             "Request": {
                 "data": {"data": ble_data, "type": "bleData"},
                 "from": self._user_object_id,
-                "time": request_sent_time,
+                "time": request_time,
                 "to": "ALL",
             },
         }
-        headers = {
-            "x-parse-application-id": PIXIE_PLUS_CLOUD_APPLICATION_ID,
-            "x-parse-installation-id": self._installation_id,
-            "x-parse-client-key": PIXIE_PLUS_CLOUD_CLIENT_KEY,
-            "content-type": "application/json",
-            "x-parse-session-token": self._session_token,
+
+    async def async_keep_alive(self) -> bool:
+        """Use the pooled connection if nothing has used it for a while.
+
+        Returns True if a keep-alive request was sent.
+        """
+        now = time.monotonic()
+        if (
+            self._last_request_at is not None
+            and now - self._last_request_at < PIXIE_PLUS_CLOUD_KEEP_ALIVE_INTERVAL
+        ):
+            return False
+        self._last_request_at = now
+        response = await self._httpx_client.get(self._url + "health")
+        self._http_version = response.http_version
+        self._keep_alives += 1
+        return True
+
+    def metrics(self) -> dict:
+        return {
+            "http_version": self._http_version,
+            "keep_alives": self._keep_alives,
+            "live_query": (
+                self._live_query.metrics() if self._live_query is not None else None
+            ),
         }
 
+    def _request_sent(self, request_times):
+        sent_at = time.monotonic()
+        self._last_request_at = sent_at
+        if self._latency_tracker is not None:
+            self._latency_tracker.request_sent(request_times, sent_at)
+        return sent_at
+
+    def _request_completed(self, sent_at):
+        if self._latency_tracker is not None:
+            self._latency_tracker.request_completed(time.monotonic() - sent_at)
+
+    def _next_request_times(self, count: int):
+        """Request times in ms, increasing across requests.
+
+        Receivers tell requests apart by their time, so a batch sent within
+        a few ms of the previous one must not reuse its times.
+        """
+        start = max(int(time.time() * 1000), self._last_request_time + 1)
+        self._last_request_time = start + count - 1
+        return list(range(start, start + count))
+
+    async def send_live_group_request(self, ble_data):
+        (request_sent_time,) = self._next_request_times(1)
+        payload = self._live_group_payload(ble_data, request_sent_time)
+
+        sent_at = self._request_sent((request_sent_time,))
         response = await self._httpx_client.put(
-            PIXIE_PLUS_CLOUD_URL + "classes/LiveGroup/" + self._live_group_id,
-            headers=headers,
-            json=payload,
+            self._live_group_url,
+            headers=self._session_headers,
+            content=json_dumps(payload),
         )
+        self._request_completed(sent_at)
         _LOGGER.info(
             "Sent on command with payload: %s to %s",
-            json.dumps(payload),
-            PIXIE_PLUS_CLOUD_URL + "classes/LiveGroup/" + self._live_group_id,
+            payload,
+            self._live_group_url,
         )
 
         if response.status_code != 200:
@@ -292,9 +768,69 @@ class PixiePlusCloud:
 
         return request_sent_time
 
-    async def home_object(self):
-        results = await self._fetch_class("Home")
-        return results[0]
+    async def send_live_group_requests(self, ble_data_list):
+        """Send several BLE frames to the LiveGroup in one Parse batch request.
+
+        Returns the request time of each frame, in order.
+        """
+        if len(ble_data_list) == 1:
+            return [await self.send_live_group_request(ble_data_list[0])]
+
+        request_times = self._next_request_times(len(ble_data_list))
+        payload = {
+            "requests": [
+                {
+                    "method": "PUT",
+                    "path": self._live_group_path,
+                    "body": self._live_group_payload(ble_data, request_time),
+                }
+                for ble_data, request_time in zip(ble_data_list, request_times)
+            ]
+        }
+
+        sent_at = self._request_sent(request_times)
+        response = await self._httpx_client.post(
+            self._url + "batch",
+            headers=self._session_headers,
+            content=json_dumps(payload),
+        )
+        self._request_completed(sent_at)
+        _LOGGER.info(
+            "Sent %d commands in one batch to %s",
+            len(ble_data_list),
+            self._live_group_path,
+        )
+
+        if response.status_code != 200:
+            _LOGGER.error(
+                "Sending batch request failed with status code: %d",
+                response.status_code,
+            )
+        else:
+            for result in _response_json(response):
+                if "error" in result:
+                    _LOGGER.error("Sending request failed - %s", result["error"])
+
+        return request_times
+
+    async def home_object(self, keys=None, updated_after=None):
+        """Fetch the current Home, limited to the given fields if keys is set.
+
+        With updated_after set the fetch is conditional and returns None if
+        the Home has not changed since then.
+        """
+        where = {"objectId": await self.currentHomeId()}
+        if updated_after is None:
+            results = await self._fetch_class(
+                "Home", {"where": where, "_method": "GET"}, keys=keys
+            )
+            return results[0]
+
+        where["updatedAt"] = {"$gt": _parse_date(updated_after)}
+        results = await self._fetch_class(
+            "Home", {"where": where, "_method": "GET"}, keys=keys
+        )
+        return results[0] if results else None
 
     async def credentials(self):
         return {
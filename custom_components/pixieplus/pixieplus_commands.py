@@ -0,0 +1,333 @@
+"""PixiePlus command scheduling"""
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DEFAULT_COMMAND_BATCH_WINDOW,
+    DEFAULT_GATEWAY_RATE,
+    DEFAULT_GATEWAY_BURST,
+)
+
+from .pixieplus_metrics import RunningStat
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+
+class QueuedCommand:
+    """A BLE frame waiting to be sent and the future its caller awaits.
+
+    `expectation` is whatever the caller wants handed to `send_batch` with
+    the frame, e.g. a check for the status the command leads to.
+    """
+
+    __slots__ = (
+        "ble_data",
+        "future",
+        "enqueued_at",
+        "expires_at",
+        "device",
+        "sequence",
+        "expectation",
+    )
+
+    def __init__(
+        self,
+        ble_data: str,
+        future,
+        expires_at=None,
+        device=None,
+        sequence=0,
+        expectation=None,
+    ):
+        self.ble_data = ble_data
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.expires_at = expires_at
+        self.device = device
+        self.sequence = sequence
+        self.expectation = expectation
+
+
+class TokenBucket:
+    """Allows `rate` frames per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def available(self) -> int:
+        self._refill()
+        return int(self.tokens)
+
+    def consume(self, count: int):
+        self.tokens -= count
+
+    def delay(self, count: int = 1) -> float:
+        """Seconds until `count` tokens are available."""
+        self._refill()
+        return max(0.0, (count - self.tokens) / self.rate)
+
+
+class CommandScheduler:
+    """Batches, prioritises and rate limits the commands for one gateway.
+
+    Commands are collected for a short window and sent together, at most one
+    batch in flight at a time. High priority commands (on/off) always leave
+    before low priority ones (brightness ramps), and the gateway's token
+    bucket limits how many frames reach the BLE mesh per second. Commands
+    whose deadline passes while queued are dropped.
+
+    Commands sent with a key are latest-wins: a newer command with the same
+    key replaces the queued one, and both callers wait for the newer frame.
+
+    Priority only reorders commands for different devices, the commands for
+    one device leave in the order they were queued. A command sent with
+    `replace_low_priority` (off) drops the low priority ones already queued
+    for its device instead of waiting behind them.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        send_batch,
+        window: float = DEFAULT_COMMAND_BATCH_WINDOW,
+        max_batch_size: int = 50,
+        rate: float = DEFAULT_GATEWAY_RATE,
+        burst: int = DEFAULT_GATEWAY_BURST,
+    ):
+        """
+        Args :
+            hass: HomeAssistance core
+            send_batch: Coroutine function sending a list of QueuedCommand
+                and returning one request time per command
+            window: Seconds to wait for more commands before sending
+            max_batch_size: Maximum number of frames per cloud request
+            rate: Frames per second the gateway can relay
+            burst: Frames the gateway can take in one burst
+        """
+        self._hass = hass
+        self._send_batch = send_batch
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._bucket = TokenBucket(rate, burst)
+
+        self._lanes = ({}, {})
+        self._sequence = itertools.count()
+        self._flush_handle = None
+        self._flush_task = None
+        # The batch in flight, its callers are cancelled on shutdown
+        self._sending = ()
+
+        self._batches = 0
+        self._commands = 0
+        self._superseded = 0
+        self._expired = 0
+        self._throttled = 0
+        self._last_batch_size = 0
+        self._max_seen_batch_size = 0
+        self._wait_time = RunningStat()
+        self._latency = RunningStat()
+
+    async def async_send(
+        self,
+        ble_data: str,
+        key=None,
+        priority: int = PRIORITY_HIGH,
+        deadline=None,
+        device=None,
+        replace_low_priority: bool = False,
+        expectation=None,
+    ):
+        """Queue a frame and wait until the batch holding it has been sent.
+
+        Returns None if the command was dropped because its deadline (seconds
+        from now) passed before the gateway had capacity for it, or because
+        a command for the same device sent with `replace_low_priority`
+        superseded it.
+        """
+        if key is None:
+            key = object()
+        expires_at = None if deadline is None else time.monotonic() + deadline
+
+        command = None
+        for lane in self._lanes:
+            command = lane.pop(key, None)
+            if command is not None:
+                break
+        if command is None:
+            command = QueuedCommand(
+                ble_data,
+                self._hass.loop.create_future(),
+                expires_at,
+                device,
+                next(self._sequence),
+                expectation,
+            )
+        else:
+            # Re-queue at the end so it stays ordered after other commands
+            command.ble_data = ble_data
+            command.expires_at = expires_at
+            command.expectation = expectation
+            command.sequence = next(self._sequence)
+            self._superseded += 1
+        if replace_low_priority and device is not None:
+            self._drop_low_priority(device)
+        self._lanes[priority][key] = command
+
+        self._schedule_flush()
+        return await asyncio.shield(command.future)
+
+    def _drop_low_priority(self, device):
+        lane = self._lanes[PRIORITY_LOW]
+        for key in [key for key, command in lane.items() if command.device == device]:
+            command = lane.pop(key)
+            self._superseded += 1
+            if not command.future.done():
+                command.future.set_result(None)
+
+    def _has_pending(self) -> bool:
+        return any(self._lanes)
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None or self._flush_task is not None:
+            return
+        self._flush_handle = self._hass.loop.call_later(self._window, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._flush_task = self._hass.async_create_background_task(
+            self._async_flush(), "pixieplus command batch"
+        )
+
+    async def _async_flush(self):
+        try:
+            while self._has_pending():
+                available = min(self._bucket.available(), self._max_batch_size)
+                if available < 1:
+                    self._throttled += 1
+                    await asyncio.sleep(self._bucket.delay())
+                    continue
+
+                batch = self._take(available)
+                if batch:
+                    self._bucket.consume(len(batch))
+                    await self._async_send_batch(batch)
+        finally:
+            self._flush_task = None
+
+    def _take(self, count: int):
+        """Dequeue up to count live commands, highest priority lane first.
+
+        Parse runs the sub-requests of a batch concurrently, so a batch holds
+        at most one frame per device, the one it queued first. Later frames
+        for a device wait for the next batch, which is only sent once this
+        one has completed.
+        """
+        now = time.monotonic()
+        oldest = {}
+        for lane in self._lanes:
+            for command in lane.values():
+                if command.device is not None and command.sequence < oldest.get(
+                    command.device, math.inf
+                ):
+                    oldest[command.device] = command.sequence
+
+        batch = []
+        devices = set()
+        for lane in self._lanes:
+            for key, command in list(lane.items()):
+                if len(batch) >= count:
+                    return batch
+                if command.device is not None and (
+                    command.device in devices
+                    or command.sequence != oldest[command.device]
+                ):
+                    continue
+                del lane[key]
+                if command.expires_at is not None and command.expires_at < now:
+                    self._expired += 1
+                    if not command.future.done():
+                        command.future.set_result(None)
+                    continue
+                if command.device is not None:
+                    devices.add(command.device)
+                self._wait_time.add(now - command.enqueued_at)
+                batch.append(command)
+        return batch
+
+    async def _async_send_batch(self, batch):
+        self._sending = batch
+        try:
+            results = await self._send_batch(batch)
+        except Exception as e:
+            _LOGGER.error("Sending command batch failed [%s]", e)
+            for command in batch:
+                if not command.future.done():
+                    command.future.set_exception(e)
+            return
+        finally:
+            self._sending = ()
+
+        sent_at = time.monotonic()
+        for command, result in zip(batch, results):
+            self._latency.add(sent_at - command.enqueued_at)
+            if not command.future.done():
+                command.future.set_result(result)
+
+        self._batches += 1
+        self._commands += len(batch)
+        self._last_batch_size = len(batch)
+        self._max_seen_batch_size = max(self._max_seen_batch_size, len(batch))
+
+    def async_shutdown(self):
+        """Cancel the pending flush and every command not sent or in flight."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        for command in self._sending:
+            command.future.cancel()
+        for lane in self._lanes:
+            for command in lane.values():
+                command.future.cancel()
+            lane.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "batches": self._batches,
+            "commands": self._commands,
+            "queue_depth": {
+                "high": len(self._lanes[PRIORITY_HIGH]),
+                "low": len(self._lanes[PRIORITY_LOW]),
+            },
+            "superseded": self._superseded,
+            "expired": self._expired,
+            "throttled": self._throttled,
+            "tokens": round(self._bucket.tokens, 1),
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size": self._max_seen_batch_size,
+            "average_batch_size": (
+                self._commands / self._batches if self._batches else None
+            ),
+            "wait_time": self._wait_time.as_ms(),
+            "latency": self._latency.as_ms(),
+        }
@@ -0,0 +1,116 @@
+"""PixiePlus shared cloud connections"""
+
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util.ssl import get_default_context
+
+from .const import DOMAIN, DEFAULT_STALE_TIMEOUT
+from .pixieplus_cloud import PixiePlusLiveQuery, create_http_client
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_CONNECTIONS = f"{DOMAIN}_connections"
+
+
+class PixiePlusConnection:
+    """HTTP client and LiveQuery socket shared by the homes of one account.
+
+    Each holder brings its own stale timeout. The socket uses the smallest,
+    so no entry's socket goes silent for longer than it allows.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        username: str,
+        stale_timeout: float = DEFAULT_STALE_TIMEOUT,
+    ):
+        self.username = username
+        # Cached by Home Assistant, so creating clients never blocks the loop
+        self.ssl_context = get_default_context()
+        self.http_client = create_http_client(self.ssl_context)
+        self.live_query = PixiePlusLiveQuery(
+            async_get_clientsession(hass), stale_timeout=stale_timeout
+        )
+        self._stale_timeouts = []
+        self._hass = hass
+        self._task = None
+
+    @property
+    def references(self) -> int:
+        return len(self._stale_timeouts)
+
+    def add_holder(self, stale_timeout: float):
+        self._stale_timeouts.append(stale_timeout)
+        self.live_query.set_stale_timeout(min(self._stale_timeouts))
+
+    def remove_holder(self, stale_timeout: float):
+        self._stale_timeouts.remove(stale_timeout)
+        if self._stale_timeouts:
+            self.live_query.set_stale_timeout(min(self._stale_timeouts))
+
+    def async_start(self, session_token: str):
+        """Run the socket with this session unless it is already running."""
+        self.live_query.set_session_token(session_token)
+        if self._task is None:
+            self._task = self._hass.async_create_background_task(
+                self.live_query.async_run(self.ssl_context),
+                f"{DOMAIN} live query {self.username}",
+            )
+
+    async def async_close(self):
+        await self.live_query.async_close()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.http_client.aclose()
+
+
+class PixiePlusConnectionManager:
+    """Hands out one reference counted connection per account."""
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self._connections = {}
+
+    def acquire(
+        self, username: str, stale_timeout: float = DEFAULT_STALE_TIMEOUT
+    ) -> PixiePlusConnection:
+        key = username.lower()
+        connection = self._connections.get(key, None)
+        if connection is None:
+            connection = PixiePlusConnection(self._hass, key, stale_timeout)
+            self._connections[key] = connection
+        connection.add_holder(stale_timeout)
+        _LOGGER.debug(
+            "PixiePlus connection for %s has %d users", key, connection.references
+        )
+        return connection
+
+    async def async_release(
+        self,
+        connection: PixiePlusConnection,
+        stale_timeout: float = DEFAULT_STALE_TIMEOUT,
+    ):
+        """Drop a reference, closing the connection when it was the last.
+
+        `stale_timeout` is the one the reference was acquired with.
+        """
+        connection.remove_holder(stale_timeout)
+        if connection.references > 0:
+            return
+        if self._connections.get(connection.username, None) is connection:
+            del self._connections[connection.username]
+        await connection.async_close()
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+
+def async_get_connection_manager(hass: HomeAssistant) -> PixiePlusConnectionManager:
+    manager = hass.data.get(DATA_CONNECTIONS, None)
+    if manager is None:
+        manager = hass.data[DATA_CONNECTIONS] = PixiePlusConnectionManager(hass)
+    return manager
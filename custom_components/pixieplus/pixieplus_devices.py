@@ -0,0 +1,114 @@
+"""PixiePlus device list parsing"""
+
+from collections import namedtuple
+from functools import lru_cache
+import logging
+
+from homeassistant.components.light import ColorMode
+
+from .const import (
+    CONF_DEVICE_ID,
+    CONF_DEVICE_NAME,
+    CONF_BRIDGE_NAME,
+    CONF_DEVICE_MAC,
+    CONF_TYPE,
+    CONF_STYPE,
+    CONF_MODEL,
+    CONF_MANUFACTURER,
+    CONF_FIRMWARE,
+    CONF_LIGHT_SWITCH,
+    CONF_LIGHT_DIMMER,
+    CONF_RGB_LIGHT,
+    CONF_CCT_LIGHT,
+    PIXIE_DEVICES_SPECS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DeviceCapabilities = namedtuple(
+    "DeviceCapabilities",
+    ["model", "manufacturer", "light", "dimmer", "rgb", "cct", "color_modes"],
+)
+
+
+@lru_cache(maxsize=None)
+def device_capabilities(type_id: int, stype_id: int) -> DeviceCapabilities:
+    """
+    Args :
+        type_id: The Pixie device type id as a number.
+        stype_id: The Pixie device sub type id as a number.
+    Returns :
+        What a model can do, compiled from PIXIE_DEVICES_SPECS once and
+        shared by every entity of that model.
+    """
+    specs = PIXIE_DEVICES_SPECS[type_id][stype_id]
+    color_modes = set()
+    if specs[CONF_CCT_LIGHT]:
+        color_modes.add(ColorMode.COLOR_TEMP)
+    if specs[CONF_RGB_LIGHT]:
+        color_modes.add(ColorMode.RGB)
+    if not color_modes and specs[CONF_LIGHT_DIMMER]:
+        color_modes.add(ColorMode.BRIGHTNESS)
+    if not color_modes:
+        color_modes.add(ColorMode.ONOFF)
+    return DeviceCapabilities(
+        model=specs[CONF_MODEL],
+        manufacturer=specs[CONF_MANUFACTURER],
+        light=bool(specs[CONF_LIGHT_SWITCH]),
+        dimmer=bool(specs[CONF_LIGHT_DIMMER]),
+        rgb=bool(specs[CONF_RGB_LIGHT]),
+        cct=bool(specs[CONF_CCT_LIGHT]),
+        color_modes=frozenset(color_modes),
+    )
+
+
+def home_devices(home_object: dict):
+    """Return the supported devices and the gateway of a full Home object."""
+    devices = []
+    gateway = None
+    for device in home_object["deviceList"]:
+        _LOGGER.debug("Processing device - %s", device)
+        if CONF_DEVICE_ID not in device:
+            _LOGGER.warning("Skipped device, missing id - %s", device)
+            continue
+        if CONF_TYPE not in device:
+            _LOGGER.warning("Skipped device, missing type - %s", device)
+            continue
+        if device[CONF_TYPE] not in PIXIE_DEVICES_SPECS:
+            _LOGGER.warning("Skipped device, invalid type - %s", device["type"])
+            continue
+        if CONF_STYPE not in device:
+            _LOGGER.warning("Skipped device, missing stype - %s", device)
+            continue
+        if device[CONF_STYPE] not in PIXIE_DEVICES_SPECS[device[CONF_TYPE]]:
+            _LOGGER.warning("Skipped device, invalid stype - %s", device["stype"])
+            continue
+
+        if "version" not in device:
+            device[CONF_FIRMWARE] = "unknown"
+
+        ha_device = {
+            CONF_DEVICE_ID: device[CONF_DEVICE_ID],
+            CONF_DEVICE_NAME: device.get(
+                CONF_DEVICE_NAME,
+                f"{PIXIE_DEVICES_SPECS[device[CONF_TYPE]][device[CONF_STYPE]][CONF_MODEL]}-{device[CONF_DEVICE_ID]}",
+            ),
+            CONF_DEVICE_MAC: device[CONF_DEVICE_MAC],
+            CONF_TYPE: device[CONF_TYPE],
+            CONF_STYPE: device[CONF_STYPE],
+            CONF_MODEL: PIXIE_DEVICES_SPECS[device[CONF_TYPE]][device[CONF_STYPE]][
+                CONF_MODEL
+            ],
+            CONF_MANUFACTURER: PIXIE_DEVICES_SPECS[device[CONF_TYPE]][
+                device[CONF_STYPE]
+            ][CONF_MANUFACTURER],
+            CONF_FIRMWARE: device["version"],
+        }
+
+        if device[CONF_TYPE] == 1 and device[CONF_STYPE] == 2:
+            gateway = ha_device
+            gateway[CONF_DEVICE_NAME] = device[CONF_BRIDGE_NAME]
+        else:
+            devices.append(ha_device)
+
+    return devices, gateway
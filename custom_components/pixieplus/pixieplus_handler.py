@@ -1,12 +1,18 @@
 """PixiePlus handler"""
 
+from datetime import timedelta
+from functools import partial
+import asyncio
 import logging
-import ssl
+import time
 
-from homeassistant.core import HomeAssistant
+import httpx
+
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.helpers.httpx_client import get_async_client
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
 
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
 from .const import (
@@ -19,17 +25,61 @@ from .const import (
     CONF_DEVICES,
     CONF_GATEWAY,
     CONF_DEVICE_ID,
+    CONF_TYPE,
+    CONF_STYPE,
+    STATUS_BRIGHTNESS,
+    CONF_COMMAND_BATCH_WINDOW,
+    CONF_GATEWAY_RATE,
+    CONF_GATEWAY_BURST,
+    CONF_STALE_TIMEOUT,
+    CONF_MIN_WRITE_INTERVAL,
+    DEFAULT_COMMAND_BATCH_WINDOW,
+    DEFAULT_GATEWAY_RATE,
+    DEFAULT_GATEWAY_BURST,
+    DEFAULT_LOW_PRIORITY_DEADLINE,
+    DEFAULT_STALE_TIMEOUT,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    STATUS_STORAGE_VERSION,
+    STATUS_SAVE_DELAY,
     CMD_ON,
     CMD_OFF,
     CMD_SET_BRIGHTNESS,
+    CMD_SET_COLOR,
 )
 
-from .command_utils import make_ble_command_data
+from .command_utils import decode_ble_frame, frame_commands, make_ble_command_data
 
-from .pixieplus_cloud import PixiePlusCloud
+from .pixieplus_bridge import PixiePlusUpdateBridge
+from .pixieplus_cloud import (
+    PixiePlusCloud,
+    PIXIE_PLUS_CLOUD_MAX_BATCH_SIZE,
+    PIXIE_PLUS_CLOUD_KEEP_ALIVE_INTERVAL,
+    HOME_STATUS_KEYS,
+    reconnect_delay,
+)
+from .pixieplus_connection import async_get_connection_manager
+from .pixieplus_commands import CommandScheduler, PRIORITY_LOW
+from .pixieplus_devices import home_devices
+from .pixieplus_metrics import CommandLatencyTracker, PhaseTimer, RunningStat
+from .pixieplus_polling import PollingBackoff
+from .pixieplus_store import DeviceStateStore, parse_updated_at
+from .pixieplus_writes import EntityWriteScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
+# Commands the handler sends, which a frame is matched against when its
+# command type and id are shared by several commands
+SENT_COMMANDS = (CMD_ON, CMD_OFF, CMD_SET_BRIGHTNESS)
+
+# Commands where only the newest queued value per device is worth sending.
+# They go in the low priority lane and are dropped once they are too old.
+LATEST_WINS_COMMANDS = (CMD_SET_BRIGHTNESS, CMD_SET_COLOR)
+
+
+def status_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Storage for the last known device statuses of a config entry."""
+    return Store(hass, STATUS_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.status")
+
 
 class PixiePlusHandler(DataUpdateCoordinator):
     def __init__(self, hass: HomeAssistant, entry: ConfigEntry):
@@ -38,11 +88,19 @@ class PixiePlusHandler(DataUpdateCoordinator):
             hass: HomeAssistance core
             entry: The config flow entry for this integration
         """
+        # Poll until the LiveQuery socket confirms push updates are flowing
+        self._polling = PollingBackoff()
+        self._push_healthy = False
+        self._push_lost_at = None
+        self._reconnects = 0
+        self._time_to_consistent = RunningStat()
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
+            update_interval=timedelta(seconds=self._polling.interval),
         )
+        self._entry = entry
         self._username = entry.data[CONF_USERNAME]
         self._password = entry.data[CONF_PASSWORD]
         self._installation_id = entry.data[CONF_INSTALLATION_ID]
@@ -52,11 +110,50 @@ class PixiePlusHandler(DataUpdateCoordinator):
         self._live_group_id = entry.data[CONF_LIVE_GROUP_ID]
         self._devices = entry.data[CONF_DEVICES]
         self._gateway = entry.data[CONF_GATEWAY]
+        self._device_types = {
+            device[CONF_DEVICE_ID]: (device[CONF_TYPE], device[CONF_STYPE])
+            for device in self._devices
+        }
+        self._store = DeviceStateStore(
+            device[CONF_DEVICE_ID] for device in self._devices
+        )
+        self._status_store = status_store(hass, entry.entry_id)
+        self._status_save_pending = False
+        self._topology = None
+        self._topology_task = None
+        self._resync_task = None
+        self._start_task = None
+        self._startup = PhaseTimer()
 
         self._last_request_time = -1
+        self._command_latency = CommandLatencyTracker()
+
+        self._changed_device_ids = None
+        self._suppressed_writes = 0
+        self.entity_writes = EntityWriteScheduler(
+            hass,
+            entry.options.get(CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL),
+        )
+
+        self._bridge = PixiePlusUpdateBridge(hass.loop, self._on_bridge_message)
+        self._message_handlers = {
+            "Home": self._on_home_update_message,
+            "LiveGroup": self._on_live_group_update_message,
+            "HP": self._on_hp_update_message,
+        }
+
+        # Entries of the same account share one HTTP client and socket
+        self._stale_timeout = entry.options.get(
+            CONF_STALE_TIMEOUT, DEFAULT_STALE_TIMEOUT
+        )
+        self._connection = async_get_connection_manager(hass).acquire(
+            self._username, self._stale_timeout
+        )
+        self._keep_alive_unsub = None
+        self._unsubscribers = []
 
         self._pixieplus_cloud = PixiePlusCloud(
-            get_async_client(self.hass, True),
+            self._connection.http_client,
             self._username,
             self._password,
             self._installation_id,
@@ -64,88 +161,436 @@ class PixiePlusHandler(DataUpdateCoordinator):
             self._session_token,
             self._current_home_id,
             self._live_group_id,
+            latency_tracker=self._command_latency,
+            live_query=self._connection.live_query,
         )
 
+        # Every frame is relayed by this entry's gateway, so it owns the bucket
+        self._scheduler = CommandScheduler(
+            hass,
+            self._async_send_frames,
+            entry.options.get(CONF_COMMAND_BATCH_WINDOW, DEFAULT_COMMAND_BATCH_WINDOW),
+            PIXIE_PLUS_CLOUD_MAX_BATCH_SIZE,
+            entry.options.get(CONF_GATEWAY_RATE, DEFAULT_GATEWAY_RATE),
+            entry.options.get(CONF_GATEWAY_BURST, DEFAULT_GATEWAY_BURST),
+        )
+
+    async def async_load_status(self):
+        """Start from the statuses saved before the last restart.
+
+        Entities added afterwards come up available with their last known
+        state, the first refresh then only fetches what changed since.
+        """
+        try:
+            with self._startup.phase("restore"):
+                data = await self._status_store.async_load()
+        except Exception as e:
+            _LOGGER.warning("Could not load saved PixiePlus statuses [%s]", e)
+            return
+        if data and self._store.restore(data):
+            self.data = self._store
+
+    @callback
+    def _async_schedule_status_save(self):
+        self._status_save_pending = True
+        self._status_store.async_delay_save(self._status_data, STATUS_SAVE_DELAY)
+
+    @callback
+    def _status_data(self) -> dict:
+        self._status_save_pending = False
+        return self._store.as_dict()
+
+    @callback
+    def async_start(self):
+        """Connect to the cloud without holding up Home Assistant's startup."""
+        if self._start_task is None:
+            self._start_task = self._entry.async_create_background_task(
+                self.hass,
+                self._async_start(),
+                f"{DOMAIN} start {self._entry.entry_id}",
+            )
+
+    async def _async_start(self):
+        # The stored session is usually still valid, so the first fetch does
+        # not wait for the session check, subscriptions or the socket
+        await asyncio.gather(self._async_setup(), self._async_first_refresh())
+        if not self.last_update_success:
+            # The fetch ran with a session the server has since rejected
+            await self.async_refresh()
+        self._startup.mark("ready")
+        self._start_task = None
+
+    async def _async_first_refresh(self):
+        with self._startup.phase("first_refresh"):
+            await self.async_refresh()
+
     async def _async_setup(self):
         _LOGGER.info("Subscribing to PixiePlus updates")
+        attempt = 0
+        with self._startup.phase("session"):
+            while True:
+                try:
+                    # Also opens the pooled connection the first command will use
+                    if await self._pixieplus_cloud.async_start_session():
+                        await self._async_save_credentials()
+                    break
+                except Exception as e:
+                    _LOGGER.error("Could not connect to PixiePlus Cloud [%s]", e)
+                await asyncio.sleep(reconnect_delay(attempt))
+                attempt += 1
+
+        with self._startup.phase("subscribe"):
+            self._keep_alive_unsub = async_track_time_interval(
+                self.hass,
+                self._async_keep_alive,
+                timedelta(seconds=PIXIE_PLUS_CLOUD_KEEP_ALIVE_INTERVAL),
+                name=f"{DOMAIN} keep alive",
+            )
+            self._unsubscribers.extend(
+                (
+                    self._pixieplus_cloud.subscribe_home_updates(
+                        partial(self._bridge.submit, "Home")
+                    ),
+                    self._pixieplus_cloud.subscribe_live_group_updates(
+                        partial(self._bridge.submit, "LiveGroup")
+                    ),
+                    self._pixieplus_cloud.subscribe_hp_updates(
+                        partial(self._bridge.submit, "HP")
+                    ),
+                    self._pixieplus_cloud.subscribe_connection_state(
+                        self._on_push_state
+                    ),
+                    await self._pixieplus_cloud.async_subscribe(),
+                )
+            )
+            self._connection.async_start(self._pixieplus_cloud.session_token)
+
+    async def _async_save_credentials(self):
+        """Persist the session of a new login to the config entry.
+
+        The home and LiveGroup ids stay as configured, a login reports the
+        account's current home which need not be this entry's.
+        """
+        credentials = await self._pixieplus_cloud.credentials()
+        self._session_token = credentials[CONF_SESSION_TOKEN]
+        self._user_object_id = credentials[CONF_USER_OBJECT_ID]
+        self.hass.config_entries.async_update_entry(
+            self._entry,
+            data={
+                **self._entry.data,
+                CONF_SESSION_TOKEN: self._session_token,
+                CONF_USER_OBJECT_ID: self._user_object_id,
+            },
+        )
+
+    async def _async_keep_alive(self, now=None):
         try:
-            ssl_context = await self.hass.async_add_executor_job(
-                ssl.create_default_context
+            await self._pixieplus_cloud.async_keep_alive()
+        except httpx.HTTPError as e:
+            _LOGGER.debug("PixiePlus keep alive failed [%s]", e)
+
+    async def async_shutdown(self) -> None:
+        await super().async_shutdown()
+        if self._keep_alive_unsub is not None:
+            self._keep_alive_unsub()
+            self._keep_alive_unsub = None
+        self._scheduler.async_shutdown()
+        self.entity_writes.async_shutdown()
+        if self._status_save_pending:
+            # Also cancels the delayed save, which holds on to this handler
+            await self._status_store.async_save(self._status_data())
+        while self._unsubscribers:
+            self._unsubscribers.pop()()
+        # Background refreshes would otherwise outlive the HTTP client
+        for task in (self._start_task, self._resync_task, self._topology_task):
+            if task is not None:
+                task.cancel()
+        self._start_task = self._resync_task = self._topology_task = None
+        # The last entry of the account closes the socket
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await async_get_connection_manager(self.hass).async_release(
+                connection, self._stale_timeout
             )
-            await self._pixieplus_cloud.login()
-            self.hass.async_add_executor_job(
-                self._pixieplus_cloud.connect_ws, ssl_context
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify only the entities whose device status changed."""
+        changed_device_ids = self._changed_device_ids
+        self._changed_device_ids = None
+        if changed_device_ids is None or changed_device_ids:
+            self._async_schedule_status_save()
+        if changed_device_ids is None:
+            super().async_update_listeners()
+            return
+
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed_device_ids:
+                update_callback()
+            else:
+                self._suppressed_writes += 1
+
+    async def _async_update_data(self):
+        _LOGGER.info("Updating PixiePlus data")
+        home_object = await self._pixieplus_cloud.home_object(
+            HOME_STATUS_KEYS, self._store.updated_at
+        )
+        if home_object is None:
+            changed_device_ids = set()
+        else:
+            self._check_topology(home_object)
+            changed_device_ids = self._store.apply_home(home_object)
+            self._command_latency.devices_reported(home_object.get("onlineList", {}))
+        if self.last_update_success:
+            self._changed_device_ids = changed_device_ids
+        if not self._push_healthy:
+            self.update_interval = timedelta(
+                seconds=self._polling.next(bool(changed_device_ids))
             )
-            self._pixieplus_cloud.subscribe_home_updates(self._on_home_update_message)
-            self._pixieplus_cloud.subscribe_live_group_updates(
-                self._on_live_group_update_message
+        return self._store
+
+    @callback
+    def _on_push_state(self, healthy: bool):
+        """Poll the cloud for as long as push updates are unavailable."""
+        if healthy == self._push_healthy:
+            return
+        self._push_healthy = healthy
+        if healthy:
+            _LOGGER.info("PixiePlus push updates are flowing, polling stopped")
+            self._startup.mark("push")
+            self.update_interval = None
+            self._async_unsub_refresh()
+            if self._push_lost_at is not None:
+                self._reconnects += 1
+            if self._resync_task is None:
+                self._resync_task = self._entry.async_create_background_task(
+                    self.hass,
+                    self._async_resync(self._push_lost_at),
+                    f"{DOMAIN} resync",
+                )
+            self._push_lost_at = None
+            return
+
+        _LOGGER.warning("PixiePlus push updates stopped, polling the cloud")
+        self._push_lost_at = time.monotonic()
+        self.update_interval = timedelta(seconds=self._polling.reset())
+        if self._listeners:
+            self._schedule_refresh()
+
+    async def _async_resync(self, push_lost_at):
+        """Pick up whatever changed while the socket was down.
+
+        The refresh is a single conditional Home fetch diffed against the
+        store, so only devices that changed are written.
+        """
+        try:
+            await self.async_refresh()
+        finally:
+            self._resync_task = None
+        if push_lost_at is not None and self.last_update_success:
+            self._time_to_consistent.add(time.monotonic() - push_lost_at)
+
+    def _configured_device_ids(self, devices, gateway) -> set:
+        device_ids = {device[CONF_DEVICE_ID] for device in devices}
+        if gateway is not None:
+            device_ids.add(gateway[CONF_DEVICE_ID])
+        return device_ids
+
+    def _check_topology(self, home_object):
+        """Reload the full Home when the set of devices reporting status changes.
+
+        Status snapshots only carry the onlineList, so its keys stand in for
+        the device list. The first snapshot is trusted when every device in
+        it is already configured.
+        """
+        topology = frozenset(home_object.get("onlineList", {}))
+        if topology == self._topology:
+            return
+        first_snapshot = self._topology is None
+        self._topology = topology
+        if first_snapshot and topology <= {
+            f"{device_id}"
+            for device_id in self._configured_device_ids(self._devices, self._gateway)
+        }:
+            return
+        if self._topology_task is None:
+            self._topology_task = self._entry.async_create_background_task(
+                self.hass,
+                self._async_refresh_topology(),
+                f"{DOMAIN} device list {self._entry.entry_id}",
             )
-            self._pixieplus_cloud.subscribe_hp_updates(self._on_hp_update_message)
 
+    async def _async_refresh_topology(self):
+        try:
+            devices, gateway = home_devices(await self._pixieplus_cloud.home_object())
         except Exception as e:
-            _LOGGER.error("Could not connect to PixiePlus Cloud [%s]", e)
+            _LOGGER.error("Could not load PixiePlus device list [%s]", e)
+            return
+        finally:
+            self._topology_task = None
 
-    def _extract_devices_with_status(self, home_object):
-        device_list = home_object.get("deviceList", [])
-        online_list = home_object.get("onlineList", {})
+        if self._configured_device_ids(devices, gateway) == self._configured_device_ids(
+            self._devices, self._gateway
+        ):
+            return
+        _LOGGER.info("PixiePlus device list changed, reloading")
+        self.hass.config_entries.async_update_entry(
+            self._entry,
+            data={**self._entry.data, CONF_DEVICES: devices, CONF_GATEWAY: gateway},
+        )
+        self.hass.config_entries.async_schedule_reload(self._entry.entry_id)
 
+    def metrics(self) -> dict:
         return {
-            device["id"]: device | {"status": online_list.get(f"{device['id']}", None)}
-            for device in device_list
+            "bridge": self._bridge.metrics(),
+            "store": self._store.metrics(),
+            "commands": self._scheduler.metrics(),
+            "connection": self._pixieplus_cloud.metrics(),
+            "polling": {
+                "mode": "push" if self._push_healthy else "poll",
+                "interval_s": (
+                    self.update_interval.total_seconds()
+                    if self.update_interval is not None
+                    else None
+                ),
+                "polls": self._polling.polls,
+                "unchanged_polls": self._polling.unchanged_polls,
+            },
+            "startup": self._startup.as_ms(),
+            "reconnects": self._reconnects,
+            "time_to_consistent": self._time_to_consistent.as_ms(),
+            "command_latency": self._command_latency.metrics(),
+            "suppressed_writes": self._suppressed_writes,
+            "entity_writes": self.entity_writes.metrics(),
         }
 
-    def _update_device_list_status(self, home_object):
-        device_list_update = self._extract_devices_with_status(home_object)
-        for device in self._devices:
-            device_update = device_list_update.get(device[CONF_DEVICE_ID], None)
-            if device_update is not None:
-                device["status"] = device_update.get("status", None)
-        return self._devices
-
-    def _device_string(self, device):
-        return f"{device['id']}"
-
-    async def _async_update_data(self):
-        _LOGGER.info("Updating PixiePlus data")
-        home_object = await self._pixieplus_cloud.home_object()
-        self._update_device_list_status(home_object)
-        return self._devices
+    def _on_bridge_message(self, class_name, class_object):
+        self._message_handlers[class_name](class_object)
 
     def _on_home_update_message(self, home_object):
         _LOGGER.info(
             "Received Home update message: %s",
-            list(map(self._device_string, home_object["deviceList"])),
+            list(home_object.get("onlineList", {})),
         )
-        self._update_device_list_status(home_object)
-        self.async_set_updated_data(self._devices)
+        self._check_topology(home_object)
+        self._changed_device_ids = self._store.apply_home(home_object)
+        self._command_latency.devices_reported(home_object.get("onlineList", {}))
+        self.async_set_updated_data(self._store)
 
     def _on_live_group_update_message(self, live_group_object):
-        _LOGGER.info(
-            "Received Live Group update message: %s", live_group_object["Request"]
+        request = live_group_object.get("Request", None)
+        _LOGGER.info("Received Live Group update message: %s", request)
+        if not request:
+            return
+        self._command_latency.echo_received(request.get("time", None))
+
+        request_data = request.get("data", {})
+        if request_data.get("type", None) != "bleData":
+            return
+        try:
+            frame = decode_ble_frame(request_data["data"])
+        except ValueError as e:
+            _LOGGER.debug("Ignoring Live Group request [%s]", e)
+            return
+
+        status = self._frame_status(frame)
+        if status is None:
+            return
+        if self._store.apply_status(
+            frame.dest, status, parse_updated_at(live_group_object.get("updatedAt"))
+        ):
+            self._changed_device_ids = {frame.dest}
+            self.async_set_updated_data(self._store)
+
+    def _frame_command(self, frame):
+        device_type = self._device_types.get(frame.dest, None)
+        if device_type is None:
+            return None
+        commands = frame_commands(*device_type, frame)
+        for command in SENT_COMMANDS:
+            if command in commands:
+                return command
+        return None
+
+    def _frame_status(self, frame):
+        """Translate an echoed BLE frame into the status it will produce."""
+        command = self._frame_command(frame)
+        if command == CMD_ON:
+            # The device goes back to its own last level, if we have seen it
+            device = self._store.get(frame.dest)
+            if device.br or not device.last_br:
+                return None
+            return {STATUS_BRIGHTNESS: device.last_br}
+        if command == CMD_OFF:
+            return {STATUS_BRIGHTNESS: 0}
+        if command == CMD_SET_BRIGHTNESS and frame.payload:
+            return {STATUS_BRIGHTNESS: min(frame.payload[0], 100)}
+        return None
+
+    @staticmethod
+    def _command_expectation(command, data):
+        """A check for the reported status a sent command will lead to."""
+        if command == CMD_ON:
+            # The device goes back to its own last level
+            return lambda status: (status.get(STATUS_BRIGHTNESS, None) or 0) > 0
+        if command == CMD_OFF:
+            return lambda status: status.get(STATUS_BRIGHTNESS, None) == 0
+        if command == CMD_SET_BRIGHTNESS and data:
+            br = min(int(data, 16), 100)
+            return lambda status: status.get(STATUS_BRIGHTNESS, None) == br
+        return None
+
+    async def _async_send_frames(self, commands):
+        """Send a batch of commands, expecting each device to report its effect."""
+        self._command_latency.expect_devices(
+            {
+                command.device: command.expectation
+                for command in commands
+                if command.expectation is not None
+            }
+        )
+        return await self._pixieplus_cloud.send_live_group_requests(
+            [command.ble_data for command in commands]
         )
 
     def _on_hp_update_message(self, hp_object):
         _LOGGER.info("Received Live Group update message: %s", hp_object)
 
-    async def async_on(self, device_type: int, device_stype: int, device_id: int):
-        _LOGGER.debug("Turning on device with device_id: %d", device_id)
+    async def _async_send_command(
+        self, device_type: int, device_stype: int, device_id: int, command, data=None
+    ):
         ble_data = make_ble_command_data(
-            device_type, device_stype, device_id, CMD_ON, None
-        )
-        self._last_request_time = await self._pixieplus_cloud.send_live_group_request(
-            ble_data
+            device_type, device_stype, device_id, command, data
         )
+        expectation = self._command_expectation(command, data)
+        if command in LATEST_WINS_COMMANDS:
+            request_time = await self._scheduler.async_send(
+                ble_data,
+                (device_id, command),
+                PRIORITY_LOW,
+                DEFAULT_LOW_PRIORITY_DEADLINE,
+                device=device_id,
+                expectation=expectation,
+            )
+        else:
+            request_time = await self._scheduler.async_send(
+                ble_data,
+                device=device_id,
+                replace_low_priority=command == CMD_OFF,
+                expectation=expectation,
+            )
+        if request_time is not None:
+            self._last_request_time = request_time
+
+    async def async_on(self, device_type: int, device_stype: int, device_id: int):
+        _LOGGER.debug("Turning on device with device_id: %d", device_id)
+        await self._async_send_command(device_type, device_stype, device_id, CMD_ON)
 
     async def async_off(
         self, device_type: int, device_stype: int, device_id: int, _attempt: int = 0
     ):
         _LOGGER.debug("Turning off device with device_id: %d", device_id)
-        ble_data = make_ble_command_data(
-            device_type, device_stype, device_id, CMD_OFF, None
-        )
-        self._last_request_time = await self._pixieplus_cloud.send_live_group_request(
-            ble_data
-        )
+        await self._async_send_command(device_type, device_stype, device_id, CMD_OFF)
 
     async def async_set_color(
         self, device_id: int, r: int, g: int, b: int, _attempt: int = 0
@@ -183,16 +628,13 @@ class PixiePlusHandler(DataUpdateCoordinator):
             brightness,
             device_id,
         )
-        ble_data = make_ble_command_data(
+        await self._async_send_command(
             device_type,
             device_stype,
             device_id,
             CMD_SET_BRIGHTNESS,
             f"{brightness:02x}",
         )
-        self._last_request_time = await self._pixieplus_cloud.send_live_group_request(
-            ble_data
-        )
 
     async def async_set_effect(self, device_id: int, effect: str, _attempt: int = 0):
         # await self._async_add_command_to_queue('setEffect', {'effect': effect, 'dest': device_id})
@@ -0,0 +1,170 @@
+"""PixiePlus latency metrics"""
+
+from collections import deque
+from contextlib import contextmanager
+import math
+import time
+
+DEFAULT_HISTOGRAM_SIZE = 1000
+PENDING_COMMAND_TIMEOUT = 60
+
+
+def to_ms(seconds):
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 1)
+
+
+class RunningStat:
+    __slots__ = ("count", "total", "last", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = None
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def as_ms(self) -> dict:
+        return {
+            "last_ms": to_ms(self.last),
+            "max_ms": to_ms(self.max),
+            "average_ms": to_ms(self.total / self.count) if self.count else None,
+        }
+
+
+class LatencyHistogram:
+    """Rolling window of latency samples with percentile summaries."""
+
+    def __init__(self, size: int = DEFAULT_HISTOGRAM_SIZE):
+        self._samples = deque(maxlen=size)
+        self._count = 0
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._count += 1
+
+    def percentile(self, percent: float):
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        # Nearest rank
+        index = max(0, math.ceil(len(samples) * percent / 100) - 1)
+        return samples[index]
+
+    def as_ms(self) -> dict:
+        return {
+            "count": self._count,
+            "p50_ms": to_ms(self.percentile(50)),
+            "p95_ms": to_ms(self.percentile(95)),
+            "p99_ms": to_ms(self.percentile(99)),
+        }
+
+
+class PhaseTimer:
+    """Durations of the phases of a one-off sequence such as startup."""
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self._phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._phases[name] = time.monotonic() - started
+
+    def mark(self, name: str):
+        """Record the time since the timer was created, the first time only."""
+        self._phases.setdefault(name, time.monotonic() - self._started)
+
+    def as_ms(self) -> dict:
+        return {name: to_ms(seconds) for name, seconds in self._phases.items()}
+
+
+class CommandLatencyTracker:
+    """Follows each sent command through its LiveGroup echo to the device.
+
+    Commands are correlated by the millisecond request time carried in the
+    LiveGroup request, which the cloud echoes back unchanged. All durations
+    are measured with the monotonic clock from the moment the request left.
+
+    A command is confirmed once a Home snapshot reports its device with the
+    status the command sets. The echo already updates the store, so the
+    snapshot's onlineList is checked rather than what changed in the store.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._pending_devices = {}
+        self._expected = {}
+        self.http = LatencyHistogram()
+        self.echo = LatencyHistogram()
+        self.confirmed = LatencyHistogram()
+
+    def expect_devices(self, expected):
+        """Set what the next request will do to each device.
+
+        Args :
+            expected: Device id to a function that takes the device's
+                reported status and returns True once it shows the command
+        """
+        self._expected = expected
+
+    def request_sent(self, request_times, sent_at: float):
+        self._expire(sent_at)
+        for request_time in request_times:
+            self._pending[request_time] = sent_at
+        # Registered before the request leaves, so no echo can beat it
+        for device_id, reached in self._expected.items():
+            self._pending_devices[device_id] = (sent_at, reached)
+        self._expected = {}
+
+    def request_completed(self, duration: float):
+        self.http.add(duration)
+
+    def echo_received(self, request_time):
+        sent_at = self._pending.pop(request_time, None)
+        if sent_at is not None:
+            self.echo.add(time.monotonic() - sent_at)
+
+    def devices_reported(self, online_list: dict):
+        """Confirm the pending devices a Home onlineList shows as expected."""
+        if not self._pending_devices:
+            return
+        now = time.monotonic()
+        for device_id, (sent_at, reached) in list(self._pending_devices.items()):
+            status = online_list.get(f"{device_id}", None)
+            if status is not None and reached(status):
+                del self._pending_devices[device_id]
+                self.confirmed.add(now - sent_at)
+
+    def _expire(self, now: float):
+        for expired in [
+            key
+            for key, sent_at in self._pending.items()
+            if now - sent_at > PENDING_COMMAND_TIMEOUT
+        ]:
+            del self._pending[expired]
+        for expired in [
+            key
+            for key, (sent_at, _) in self._pending_devices.items()
+            if now - sent_at > PENDING_COMMAND_TIMEOUT
+        ]:
+            del self._pending_devices[expired]
+
+    def metrics(self) -> dict:
+        return {
+            "http_put": self.http.as_ms(),
+            "echo": self.echo.as_ms(),
+            "device_confirmed": self.confirmed.as_ms(),
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,39 @@
+"""PixiePlus polling fallback"""
+
+from .const import DEFAULT_POLL_INTERVAL, DEFAULT_MAX_POLL_INTERVAL
+
+
+class PollingBackoff:
+    """Interval between polls while push updates are unavailable.
+
+    Starts at `initial` seconds and doubles after every poll that found
+    nothing new, up to `maximum`. A poll that found changes drops back to
+    `initial`, since more changes are likely to follow.
+    """
+
+    def __init__(
+        self,
+        initial: float = DEFAULT_POLL_INTERVAL,
+        maximum: float = DEFAULT_MAX_POLL_INTERVAL,
+        factor: float = 2,
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.interval = initial
+        self.polls = 0
+        self.unchanged_polls = 0
+
+    def reset(self) -> float:
+        self.interval = self.initial
+        return self.interval
+
+    def next(self, changed: bool) -> float:
+        """Record a poll and return the seconds until the next one."""
+        self.polls += 1
+        if changed:
+            self.interval = self.initial
+        else:
+            self.unchanged_polls += 1
+            self.interval = min(self.interval * self.factor, self.maximum)
+        return self.interval
@@ -0,0 +1,170 @@
+"""PixiePlus device state store"""
+
+from datetime import datetime
+
+from .const import STATUS_BRIGHTNESS, STATUS_HUE, CONF_ONLINE
+
+
+def parse_updated_at(value):
+    """Return a Parse updatedAt value as a datetime, or None if missing."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        value = value.get("iso", None)
+        if value is None:
+            return None
+    return datetime.fromisoformat(value)
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class DeviceState:
+    """Last known status of a single Pixie device."""
+
+    __slots__ = (
+        "device_id",
+        "br",
+        "last_br",
+        "hue",
+        "online",
+        "version",
+        "updated_at",
+    )
+
+    def __init__(self, device_id: int):
+        self.device_id = device_id
+        self.br = None
+        # The level an on command brings the device back to
+        self.last_br = None
+        self.hue = None
+        self.online = None
+        self.version = 0
+        self.updated_at = None
+
+    @property
+    def known(self) -> bool:
+        return self.br is not None
+
+
+class DeviceStateStore:
+    """Device states keyed by Pixie device id.
+
+    Snapshots older than the last applied one are discarded so that a slow
+    poll cannot overwrite a newer push update and vice versa.
+    """
+
+    def __init__(self, device_ids):
+        self._records = {device_id: DeviceState(device_id) for device_id in device_ids}
+        self._records_by_key = {
+            f"{device_id}": record for device_id, record in self._records.items()
+        }
+        self._updated_at = None
+        self._stale_snapshots = 0
+
+    def __contains__(self, device_id) -> bool:
+        return device_id in self._records
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    @property
+    def updated_at(self):
+        """updatedAt of the newest Home snapshot applied."""
+        return self._updated_at
+
+    def get(self, device_id: int):
+        return self._records.get(device_id, None)
+
+    def apply_home(self, home_object: dict) -> set:
+        """Apply a Home object's onlineList and return the ids that changed."""
+        updated_at = parse_updated_at(home_object.get("updatedAt", None))
+        if updated_at is not None:
+            if self._updated_at is not None and updated_at < self._updated_at:
+                self._stale_snapshots += 1
+                return set()
+            self._updated_at = updated_at
+
+        changed_device_ids = set()
+        for key, status in home_object.get("onlineList", {}).items():
+            record = self._records_by_key.get(key, None)
+            if record is not None and self._apply(record, status, updated_at):
+                changed_device_ids.add(record.device_id)
+        return changed_device_ids
+
+    def apply_status(self, device_id: int, status: dict, updated_at=None) -> bool:
+        """Apply a single device status, returning True if it changed."""
+        record = self._records.get(device_id, None)
+        if record is None:
+            return False
+        return self._apply(record, status, updated_at)
+
+    def _apply(self, record: DeviceState, status: dict, updated_at) -> bool:
+        if status is None:
+            return False
+        if updated_at is not None:
+            if record.updated_at is not None and updated_at < record.updated_at:
+                self._stale_snapshots += 1
+                return False
+            record.updated_at = updated_at
+
+        br = status.get(STATUS_BRIGHTNESS, record.br)
+        hue = status.get(STATUS_HUE, record.hue)
+        online = status.get(CONF_ONLINE, record.online)
+        if br == record.br and hue == record.hue and online == record.online:
+            return False
+
+        record.br = br
+        if br:
+            record.last_br = br
+        record.hue = hue
+        record.online = online
+        record.version += 1
+        return True
+
+    def as_dict(self) -> dict:
+        """Return the known statuses in a form HA storage can persist."""
+        return {
+            "updated_at": _isoformat(self._updated_at),
+            "devices": {
+                f"{record.device_id}": {
+                    STATUS_BRIGHTNESS: record.br,
+                    STATUS_HUE: record.hue,
+                    CONF_ONLINE: record.online,
+                    "updated_at": _isoformat(record.updated_at),
+                }
+                for record in self._records.values()
+                if record.known
+            },
+        }
+
+    def restore(self, data: dict) -> set:
+        """Load statuses saved by as_dict and return the ids restored.
+
+        Devices that are no longer configured are skipped. The restored
+        updatedAt lets the next conditional fetch return only newer changes.
+        """
+        restored_device_ids = set()
+        for key, status in data.get("devices", {}).items():
+            record = self._records_by_key.get(key, None)
+            if record is None or record.known:
+                continue
+            record.br = status.get(STATUS_BRIGHTNESS, None)
+            if record.br:
+                record.last_br = record.br
+            record.hue = status.get(STATUS_HUE, None)
+            record.online = status.get(CONF_ONLINE, None)
+            record.updated_at = parse_updated_at(status.get("updated_at", None))
+            record.version += 1
+            restored_device_ids.add(record.device_id)
+        if restored_device_ids and self._updated_at is None:
+            self._updated_at = parse_updated_at(data.get("updated_at", None))
+        return restored_device_ids
+
+    def metrics(self) -> dict:
+        return {
+            "devices": len(self._records),
+            "stale_snapshots": self._stale_snapshots,
+            "updated_at": _isoformat(self._updated_at),
+        }
@@ -0,0 +1,98 @@
+"""PixiePlus entity state write scheduling"""
+
+import time
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DEFAULT_MIN_WRITE_INTERVAL
+
+
+class EntityWriteScheduler:
+    """Coalesces and rate limits the state writes of Pixie entities.
+
+    An entity asks for a write with a function returning its visible state
+    and one that writes it. The first request after a quiet period writes
+    at once. Further requests within `min_interval` are merged into a single
+    trailing write, and a write whose visible state equals the last one
+    written is skipped. Immediate requests, for changes the user just made,
+    are never held back.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, min_interval: float = DEFAULT_MIN_WRITE_INTERVAL
+    ):
+        self._hass = hass
+        self._min_interval = min_interval
+        self._written = {}
+        self._last_write_at = {}
+        self._pending = {}
+        self.writes = 0
+        self.avoided_writes = 0
+
+    @callback
+    def async_request_write(self, key, visible_state, write, immediate=False):
+        """Write the entity `key` now or at the end of its interval.
+
+        Args :
+            key: Identifies the entity, e.g. its unique id
+            visible_state: Returns what the state machine would show
+            write: Writes the entity state, usually async_write_ha_state
+            immediate: Skip the interval, e.g. for optimistic state
+        """
+        if immediate:
+            handle = self._pending.pop(key, None)
+            if handle is not None:
+                handle.cancel()
+            self._write(key, visible_state, write)
+            return
+
+        if key in self._pending:
+            # The trailing write picks up whatever has changed by then
+            self.avoided_writes += 1
+            return
+
+        delay = self._last_write_at.get(key, -self._min_interval) + (
+            self._min_interval - time.monotonic()
+        )
+        if delay <= 0:
+            self._write(key, visible_state, write)
+            return
+
+        if visible_state() == self._written.get(key, None):
+            self.avoided_writes += 1
+            return
+        self._pending[key] = self._hass.loop.call_later(
+            delay, self._trailing_write, key, visible_state, write
+        )
+
+    def _trailing_write(self, key, visible_state, write):
+        del self._pending[key]
+        self._write(key, visible_state, write)
+
+    def _write(self, key, visible_state, write):
+        state = visible_state()
+        if key in self._written and state == self._written[key]:
+            self.avoided_writes += 1
+            return
+        self._written[key] = state
+        self._last_write_at[key] = time.monotonic()
+        self.writes += 1
+        write()
+
+    @callback
+    def async_forget(self, key):
+        """Drop the pending write and history of a removed entity."""
+        handle = self._pending.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+        self._written.pop(key, None)
+        self._last_write_at.pop(key, None)
+
+    @callback
+    def async_shutdown(self):
+        for handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+
+    def metrics(self) -> dict:
+        return {"writes": self.writes, "avoided_writes": self.avoided_writes}
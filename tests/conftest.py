@@ -0,0 +1,24 @@
+"""Fixtures for Pixie Plus tests."""
+
+import pytest
+
+from custom_components.pixieplus import pixieplus_cloud
+
+from .fake_parse_server import MOUNT_PATH, WS_PATH, FakeParseServer
+
+
+@pytest.fixture
+async def parse_server(socket_enabled, aiohttp_server, monkeypatch):
+    """Run a fake Parse server and point the cloud client at it."""
+    fake = FakeParseServer()
+    server = await aiohttp_server(fake.app)
+    monkeypatch.setattr(
+        pixieplus_cloud,
+        "PIXIE_PLUS_CLOUD_URL",
+        str(server.make_url(MOUNT_PATH + "/")),
+    )
+    monkeypatch.setattr(
+        pixieplus_cloud, "PIXIE_PLUS_CLOUD_WS_URL", str(server.make_url(WS_PATH))
+    )
+    monkeypatch.setattr(pixieplus_cloud, "PIXIE_PLUS_CLOUD_WS_RECONNECT_DELAY", 0.01)
+    return fake
@@ -0,0 +1,197 @@
+"""Stand-in for the Pixie Plus Parse server and its LiveQuery endpoint."""
+
+import asyncio
+import re
+
+from aiohttp import WSMsgType, web
+
+MOUNT_PATH = "/p0/pixieCloud"
+DEFAULT_KEYS = ("objectId", "createdAt", "updatedAt")
+DEFAULT_FIELDS = DEFAULT_KEYS + ("className",)
+WS_PATH = "/ws/p0/pixieCloud"
+
+
+def home_object(device_count=3):
+    return {
+        "objectId": "home-1",
+        "className": "Home",
+        "name": "Home",
+        "updatedAt": "2024-01-01T00:00:00.000Z",
+        "deviceList": [
+            {
+                "id": device_id,
+                "mac": f"00:00:00:00:00:{device_id:02x}",
+                "name": f"Light {device_id}",
+                "type": 23,
+                "stype": 13,
+                "version": 1,
+            }
+            for device_id in range(1, device_count + 1)
+        ],
+        "onlineList": {
+            f"{device_id}": {"br": 0, "hue": 0, "online": True}
+            for device_id in range(1, device_count + 1)
+        },
+    }
+
+
+def _project(obj, fields, defaults=DEFAULT_FIELDS):
+    if not fields:
+        return obj
+    return {
+        key: value for key, value in obj.items() if key in fields or key in defaults
+    }
+
+
+def _matches(obj, where):
+    for key, condition in where.items():
+        if isinstance(condition, dict) and "$gt" in condition:
+            value = condition["$gt"]
+            if isinstance(value, dict):
+                value = value["iso"]
+            if not obj.get(key, "") > value:
+                return False
+        elif isinstance(condition, dict) and "$regex" in condition:
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            if not re.search(condition["$regex"], obj.get(key, ""), flags):
+                return False
+        elif obj.get(key, None) != condition:
+            return False
+    return True
+
+
+class FakeParseServer:
+    """Serves the REST and LiveQuery calls PixiePlusCloud makes.
+
+    `delay` adds a fixed latency to every REST request to mimic a slow link.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.session_token = "r:token"
+        self.login_home = "home-1"
+        self.objects = {
+            "_User": [{"objectId": "user-1", "username": "user@example.com"}],
+            "Home": [home_object()],
+            "LiveGroup": [{"objectId": "live-1", "GroupID": "group-home-1"}],
+        }
+        self.requests = []
+        self.updates = []
+
+        self.client_id = "client-1"
+        self.subscriptions = {}
+        self.sockets = []
+        self.connect_count = 0
+        # Set to False to stop answering pings, like a half-open connection
+        self.autoping = True
+
+        self.app = web.Application()
+        self.app.router.add_post(MOUNT_PATH + "/login", self._handle_login)
+        self.app.router.add_get(MOUNT_PATH + "/users/me", self._handle_me)
+        self.app.router.add_post(MOUNT_PATH + "/batch", self._handle_batch)
+        self.app.router.add_post(
+            MOUNT_PATH + "/classes/{class_name}", self._handle_query
+        )
+        self.app.router.add_put(
+            MOUNT_PATH + "/classes/{class_name}/{object_id}", self._handle_update
+        )
+        self.app.router.add_get(WS_PATH, self._handle_ws)
+
+    async def _request(self, request):
+        self.requests.append(request.path)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    def _query(self, class_name, body):
+        keys = body.get("keys", "")
+        results = [
+            _project(obj, keys.split(",") if keys else None, DEFAULT_KEYS)
+            for obj in self.objects.get(class_name, [])
+            if _matches(obj, body.get("where", {}))
+        ]
+        return {"results": results[: body.get("limit", 100)]}
+
+    async def _handle_login(self, request):
+        await self._request(request)
+        user = {"objectId": "user-1", "sessionToken": self.session_token}
+        if self.login_home is not None:
+            user["curHome"] = {"objectId": self.login_home}
+        return web.json_response(user)
+
+    async def _handle_me(self, request):
+        await self._request(request)
+        if request.headers.get("x-parse-session-token") != self.session_token:
+            return web.json_response(
+                {"code": 209, "error": "Invalid session token"}, status=400
+            )
+        return web.json_response({"objectId": "user-1"})
+
+    async def _handle_query(self, request):
+        await self._request(request)
+        body = await request.json()
+        return web.json_response(self._query(request.match_info["class_name"], body))
+
+    async def _handle_update(self, request):
+        await self._request(request)
+        self.updates.append((request.match_info["class_name"], await request.json()))
+        return web.json_response({"updatedAt": "2024-01-01T00:00:01.000Z"})
+
+    async def _handle_batch(self, request):
+        await self._request(request)
+        body = await request.json()
+        responses = []
+        for sub_request in body["requests"]:
+            path = sub_request["path"][len(MOUNT_PATH) :]
+            if sub_request["method"] == "GET" and path.startswith("/classes/"):
+                class_name = path[len("/classes/") :]
+                responses.append(
+                    {"success": self._query(class_name, sub_request.get("body", {}))}
+                )
+            else:
+                responses.append({"success": {}})
+        return web.json_response(responses)
+
+    async def _handle_ws(self, request):
+        ws = web.WebSocketResponse(autoping=self.autoping)
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            data = message.json()
+            if data["op"] == "connect":
+                self.connect_count += 1
+                await ws.send_json({"op": "connected", "clientId": self.client_id})
+            elif data["op"] == "unsubscribe":
+                self.subscriptions.pop(data["requestId"], None)
+            elif data["op"] == "subscribe":
+                self.subscriptions[data["requestId"]] = data["query"]
+                await ws.send_json(
+                    {
+                        "op": "subscribed",
+                        "clientId": self.client_id,
+                        "requestId": data["requestId"],
+                    }
+                )
+        self.sockets.remove(ws)
+        return ws
+
+    async def push_update(self, request_id, class_object):
+        fields = self.subscriptions.get(request_id, {}).get("fields", None)
+        for ws in self.sockets:
+            await ws.send_json(
+                {
+                    "op": "update",
+                    "clientId": self.client_id,
+                    "requestId": request_id,
+                    "object": _project(class_object, fields),
+                }
+            )
+
+    async def wait_for_subscriptions(self, count):
+        while len(self.subscriptions) < count:
+            await asyncio.sleep(0.01)
+
+    async def wait_for_disconnect(self):
+        while self.sockets:
+            await asyncio.sleep(0.01)
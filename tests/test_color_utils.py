@@ -0,0 +1,40 @@
+import colorsys
+
+from custom_components.pixieplus import color_utils
+
+
+class TestColorUtils:
+    """Tests for the hue and brightness conversion tables."""
+
+    def test_hue_table_matches_colorsys(self):
+        """Test every table entry is the rounded colorsys conversion."""
+
+        for hue in range(361):
+            expected = tuple(
+                round(channel * 255) for channel in colorsys.hsv_to_rgb(hue / 360, 1, 1)
+            )
+            assert color_utils.hue_to_rgb(hue) == expected
+
+    def test_missing_hue_is_white(self):
+        """Test a device without a colour reports white."""
+
+        assert color_utils.hue_to_rgb(None) == (255, 255, 255)
+        assert color_utils.hue_to_rgb(361) == (255, 255, 255)
+
+    def test_brightness_tables(self):
+        """Test both brightness directions match the range conversion."""
+
+        for br in range(101):
+            assert color_utils.br_to_brightness(
+                br
+            ) == color_utils.convert_value_to_available_range(br, 0, 100, 0, 255)
+        assert color_utils.brightness_to_br(0) == 0
+        assert color_utils.brightness_to_br(128) == 50
+        assert color_utils.brightness_to_br(255) == 100
+        assert color_utils.brightness_to_br(300) == 100
+
+    def test_round_trip_keeps_pixie_brightness(self):
+        """Test sending back a reported brightness keeps the device level."""
+
+        for br in range(101):
+            assert color_utils.brightness_to_br(color_utils.br_to_brightness(br)) == br
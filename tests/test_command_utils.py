@@ -3,6 +3,8 @@ from custom_components.pixieplus import command_utils as cmd_utils
 from custom_components.pixieplus.const import (
     CMD_ON,
     CMD_SET_BRIGHTNESS,
+    CMD_SET_COLOR,
+    CMD_SET_EFFECT,
     CMD_LIGHT_DIMMER_TYPE,
 )
 
@@ -73,3 +75,80 @@ class TestCommandUtils:
         result = cmd_utils.make_ble_command_data(1, 7, 1, CMD_ON, None)
 
         assert "00000003040100c1696903000000000000000000" in result
+
+    def test_frame_table_matches_string_format(self):
+        """Test precompiled frames match the CMD_BLE_DATA_FORMAT output."""
+
+        for type_id, stype_id, command in cmd_utils.BLE_FRAME_TABLE:
+            data = "64" if command == CMD_SET_BRIGHTNESS else None
+            expected = cmd_utils.construct_ble_data_str(
+                cmd_utils.device_id_to_hex(215),
+                cmd_utils.device_command_type(type_id, stype_id, command),
+                cmd_utils.device_command_id(type_id, stype_id, command),
+                data or "",
+            )
+
+            assert (
+                cmd_utils.make_ble_command_data(type_id, stype_id, 215, command, data)
+                == expected
+            )
+
+    def test_invalid_command_raises(self):
+        """Test commands missing from the frame table still raise."""
+
+        with pytest.raises(
+            ValueError, match="Command 'set_brightness' has no mapping for device"
+        ):
+            cmd_utils.make_ble_command_data(22, 13, 1, CMD_SET_BRIGHTNESS, "64")
+
+    def test_encode_frame_matches_string_format(self):
+        """Test the bytes encoder produces the same frame as the string API."""
+
+        result = cmd_utils.encode_ble_frame(
+            1,
+            bytes.fromhex(CMD_LIGHT_DIMMER_TYPE),
+            bytes.fromhex("00"),
+            bytes((64,)),
+        )
+
+        assert result.hex() == cmd_utils.make_ble_command_data(
+            23, 13, 1, CMD_SET_BRIGHTNESS, "40"
+        )
+
+    def test_decode_brightness_frame(self):
+        """Test decoding a dimmer brightness frame."""
+
+        frame = cmd_utils.decode_ble_frame("00000003040f00c46969ffffff40000000000000")
+
+        assert frame.dest == 15
+        assert frame.command_type == bytes.fromhex(CMD_LIGHT_DIMMER_TYPE)
+        assert frame.command_id == b"\x00"
+        assert frame.payload == b"\x40"
+        assert cmd_utils.frame_commands(23, 13, frame) == (CMD_SET_BRIGHTNESS,)
+
+    def test_decode_switch_frame_from_memoryview(self):
+        """Test decoding a switch frame from a memoryview."""
+
+        data = memoryview(bytes.fromhex("00000003040100ed696901000000000000000000"))
+        frame = cmd_utils.decode_ble_frame(data)
+
+        assert frame.dest == 1
+        assert frame.payload == b""
+        assert cmd_utils.frame_commands(22, 13, frame) == (CMD_ON,)
+
+    def test_shared_command_ids_return_every_candidate(self):
+        """Test an RGB strip dimmer frame matches all commands sharing it."""
+
+        frame = cmd_utils.decode_ble_frame("00000003040f00c46969ffffff40000000000000")
+
+        assert cmd_utils.frame_commands(27, 2, frame) == (
+            CMD_SET_COLOR,
+            CMD_SET_BRIGHTNESS,
+            CMD_SET_EFFECT,
+        )
+
+    def test_decode_invalid_frame(self):
+        """Test decoding something that is not a Pixie frame."""
+
+        with pytest.raises(ValueError, match="Not a Pixie BLE frame"):
+            cmd_utils.decode_ble_frame("ffff")
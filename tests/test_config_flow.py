@@ -0,0 +1,46 @@
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.pixieplus.const import (
+    DOMAIN,
+    CONF_COMMAND_BATCH_WINDOW,
+    CONF_GATEWAY_RATE,
+    CONF_GATEWAY_BURST,
+    CONF_STALE_TIMEOUT,
+    CONF_MIN_WRITE_INTERVAL,
+)
+
+
+class TestPixiePlusOptionsFlow:
+    """Tests for the options flow."""
+
+    async def test_options_are_saved(self, hass, enable_custom_integrations):
+        """Test the tunables can be set from the options flow."""
+
+        entry = MockConfigEntry(domain=DOMAIN, data={})
+        entry.add_to_hass(hass)
+
+        result = await hass.config_entries.options.async_init(entry.entry_id)
+        assert result["type"] == FlowResultType.FORM
+        assert result["step_id"] == "init"
+
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            user_input={
+                CONF_COMMAND_BATCH_WINDOW: 0.1,
+                CONF_GATEWAY_RATE: 5,
+                CONF_GATEWAY_BURST: 10,
+                CONF_STALE_TIMEOUT: 60,
+                CONF_MIN_WRITE_INTERVAL: 1,
+            },
+        )
+
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        assert entry.options == {
+            CONF_COMMAND_BATCH_WINDOW: 0.1,
+            CONF_GATEWAY_RATE: 5.0,
+            CONF_GATEWAY_BURST: 10,
+            CONF_STALE_TIMEOUT: 60,
+            CONF_MIN_WRITE_INTERVAL: 1.0,
+        }
@@ -0,0 +1,161 @@
+import asyncio
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import STATE_ON, STATE_OFF
+
+from custom_components.pixieplus.const import DOMAIN
+from custom_components.pixieplus.pixieplus_connection import (
+    async_get_connection_manager,
+)
+
+from .fake_parse_server import home_object
+
+ENTRY_DATA = {
+    "username": "user@example.com",
+    "password": "password",
+    "installation_id": "installation",
+    "session_token": "r:token",
+    "user_object_id": "user-1",
+    "current_home_id": "home-1",
+    "live_group_id": "live-1",
+    "devices": [
+        {
+            "id": device_id,
+            "name": f"Light {device_id}",
+            "mac": f"00:00:00:00:00:{device_id:02x}",
+            "type": 23,
+            "stype": 13,
+            "model": "Smart Dimmer G3 - SDD300BTAM",
+            "manufacturer": "SAL",
+            "firmware": 1,
+        }
+        for device_id in (1, 2)
+    ],
+    "gateway": {
+        "id": 9,
+        "name": "Gateway",
+        "mac": "00:00:00:00:00:09",
+        "type": 1,
+        "stype": 2,
+        "model": "Gateway G3 - SGW3BTAM",
+        "manufacturer": "SAL",
+        "firmware": 1,
+    },
+}
+
+
+async def setup_entry(hass, hass_storage, statuses):
+    entry = MockConfigEntry(domain=DOMAIN, data=ENTRY_DATA)
+    entry.add_to_hass(hass)
+    store_statuses(hass_storage, entry, statuses)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry, hass.data[DOMAIN][entry.entry_id]
+
+
+def store_statuses(hass_storage, entry, statuses):
+    hass_storage[f"{DOMAIN}.{entry.entry_id}.status"] = {
+        "version": 1,
+        "minor_version": 1,
+        "key": f"{DOMAIN}.{entry.entry_id}.status",
+        "data": {
+            # Same as the cloud, so the first fetch finds nothing newer
+            "updated_at": home_object()["updatedAt"].replace("Z", "+00:00"),
+            "devices": statuses,
+        },
+    }
+
+
+class TestPixieLight:
+    """Tests for the light platform."""
+
+    async def test_lights_start_from_saved_statuses(
+        self, hass, hass_storage, enable_custom_integrations, parse_server
+    ):
+        """Test lights come up with their saved state before the cloud answers."""
+
+        entry, handler = await setup_entry(
+            hass,
+            hass_storage,
+            {"1": {"br": 40, "hue": 0, "online": True}, "2": {"br": 0, "hue": 0}},
+        )
+        try:
+            first = hass.states.get("light.light_1")
+            assert first.state == STATE_ON
+            assert first.attributes[ATTR_BRIGHTNESS] == 102
+            assert hass.states.get("light.light_2").state == STATE_OFF
+        finally:
+            assert await hass.config_entries.async_unload(entry.entry_id)
+
+    async def test_updates_write_through_the_scheduler(
+        self, hass, hass_storage, enable_custom_integrations, parse_server
+    ):
+        """Test pushed statuses are coalesced and user changes are immediate."""
+
+        entry, handler = await setup_entry(
+            hass,
+            hass_storage,
+            {"1": {"br": 40, "hue": 0}, "2": {"br": 0, "hue": 0}},
+        )
+        try:
+            writes = handler.metrics()["entity_writes"]
+
+            # Within the write interval of the restored write, so held back
+            handler._on_home_update_message(
+                {
+                    "objectId": "home-1",
+                    "onlineList": {"1": {"br": 60, "hue": 0}, "2": {"br": 0}},
+                }
+            )
+            handler._on_home_update_message(
+                {
+                    "objectId": "home-1",
+                    "onlineList": {"1": {"br": 80, "hue": 0}, "2": {"br": 0}},
+                }
+            )
+            assert hass.states.get("light.light_1").attributes[ATTR_BRIGHTNESS] == 102
+
+            await asyncio.sleep(0.6)
+            await hass.async_block_till_done()
+            assert hass.states.get("light.light_1").attributes[ATTR_BRIGHTNESS] == 204
+            metrics = handler.metrics()["entity_writes"]
+            assert metrics["writes"] == writes["writes"] + 1
+            assert metrics["avoided_writes"] == writes["avoided_writes"] + 1
+
+            # The user's change shows at once, inside the new interval
+            await hass.services.async_call(
+                "light",
+                "turn_on",
+                {"entity_id": "light.light_1", ATTR_BRIGHTNESS: 255},
+                blocking=True,
+            )
+            assert hass.states.get("light.light_1").attributes[ATTR_BRIGHTNESS] == 255
+            assert handler.metrics()["entity_writes"]["writes"] == metrics["writes"] + 1
+            assert [class_name for class_name, _ in parse_server.updates] == [
+                "LiveGroup"
+            ]
+        finally:
+            assert await hass.config_entries.async_unload(entry.entry_id)
+
+    async def test_failed_platform_setup_releases_connection(
+        self, hass, hass_storage, enable_custom_integrations, parse_server
+    ):
+        """Test an entry whose platforms fail to set up leaves nothing behind."""
+
+        entry = MockConfigEntry(domain=DOMAIN, data=ENTRY_DATA)
+        entry.add_to_hass(hass)
+        store_statuses(hass_storage, entry, {"1": {"br": 40, "hue": 0}})
+
+        with patch.object(
+            hass.config_entries,
+            "async_forward_entry_setups",
+            side_effect=RuntimeError("platform failed"),
+        ):
+            assert not await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+        assert entry.entry_id not in hass.data[DOMAIN]
+        assert len(async_get_connection_manager(hass)) == 0
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+from custom_components.pixieplus.pixieplus_bridge import PixiePlusUpdateBridge
+
+
+class TestPixiePlusUpdateBridge:
+    """Tests for the cloud to handler update bridge."""
+
+    async def test_home_snapshots_are_coalesced(self):
+        """Test only the newest Home snapshot is delivered."""
+
+        delivered = []
+        bridge = PixiePlusUpdateBridge(
+            asyncio.get_running_loop(),
+            lambda class_name, obj: delivered.append((class_name, obj["n"])),
+        )
+
+        for n in range(5):
+            bridge.submit("Home", {"objectId": "home-1", "n": n})
+        await asyncio.sleep(0)
+
+        assert delivered == [("Home", 4)]
+        assert bridge.metrics()["coalesced"] == 4
+
+    async def test_other_messages_are_queued_in_order(self):
+        """Test non coalesced messages are delivered in order."""
+
+        delivered = []
+        bridge = PixiePlusUpdateBridge(
+            asyncio.get_running_loop(),
+            lambda class_name, obj: delivered.append((class_name, obj["n"])),
+        )
+
+        bridge.submit("LiveGroup", {"objectId": "live-1", "n": 1})
+        bridge.submit("LiveGroup", {"objectId": "live-1", "n": 2})
+        await asyncio.sleep(0)
+
+        assert delivered == [("LiveGroup", 1), ("LiveGroup", 2)]
+
+    async def test_queue_is_bounded(self):
+        """Test the oldest queued messages are dropped when full."""
+
+        delivered = []
+        bridge = PixiePlusUpdateBridge(
+            asyncio.get_running_loop(),
+            lambda class_name, obj: delivered.append(obj["n"]),
+            max_pending=2,
+        )
+
+        for n in range(4):
+            bridge.submit("HP", {"objectId": "hp-1", "n": n})
+        await asyncio.sleep(0)
+
+        assert delivered == [2, 3]
+        assert bridge.metrics()["dropped"] == 2
+
+    async def test_submit_from_other_thread(self):
+        """Test messages submitted off the loop are delivered on the loop."""
+
+        loop = asyncio.get_running_loop()
+        delivered = asyncio.Event()
+        threads = []
+
+        def dispatch(class_name, obj):
+            threads.append(threading.get_ident())
+            delivered.set()
+
+        bridge = PixiePlusUpdateBridge(loop, dispatch)
+        await loop.run_in_executor(None, bridge.submit, "Home", {"objectId": "h"})
+        await asyncio.wait_for(delivered.wait(), 5)
+
+        assert threads == [threading.get_ident()]
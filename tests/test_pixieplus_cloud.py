@@ -0,0 +1,423 @@
+import asyncio
+from datetime import timedelta
+import json
+
+import aiohttp
+import httpx
+
+from custom_components.pixieplus.pixieplus_cloud import (
+    PixiePlusCloud,
+    PixiePlusLiveQuery,
+)
+from custom_components.pixieplus import pixieplus_cloud
+from custom_components.pixieplus.pixieplus_cloud import HOME_STATUS_KEYS
+from custom_components.pixieplus.pixieplus_metrics import CommandLatencyTracker
+from custom_components.pixieplus.pixieplus_store import parse_updated_at
+
+from .fake_parse_server import home_object
+
+
+def make_cloud(httpx_client=None, latency_tracker=None, live_query=None):
+    return PixiePlusCloud(
+        httpx_client,
+        "user@example.com",
+        "password",
+        installation_id="installation",
+        user_object_id="user-1",
+        session_token="r:token",
+        current_home_id="home-1",
+        live_group_id="live-1",
+        latency_tracker=latency_tracker,
+        live_query=live_query,
+    )
+
+
+async def run_live_query(cloud, live_query):
+    """Subscribe the cloud's home and run the socket as the connection does."""
+    await cloud.async_subscribe()
+    return asyncio.create_task(live_query.async_run())
+
+
+class TestPixiePlusLiveQuery:
+    """Tests for the asyncio LiveQuery client."""
+
+    async def test_subscribes_and_dispatches_updates(self, parse_server):
+        """Test subscriptions are sent and updates reach listeners."""
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token")
+            cloud = make_cloud(live_query=live_query)
+            home_updates = []
+            cloud.subscribe_home_updates(home_updates.append)
+            task = await run_live_query(cloud, live_query)
+
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(3), 5)
+            assert parse_server.subscriptions[2] == {
+                "className": "Home",
+                "where": {"objectId": "home-1"},
+                "fields": ["onlineList"],
+            }
+
+            await parse_server.push_update(2, home_object())
+            while not home_updates:
+                await asyncio.sleep(0.01)
+            assert home_updates[0]["objectId"] == "home-1"
+            assert "onlineList" in home_updates[0]
+            assert "deviceList" not in home_updates[0]
+
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+            assert not live_query.connected
+
+    async def test_reports_push_health(self, parse_server):
+        """Test listeners learn when subscriptions are live and when they drop."""
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token")
+            cloud = make_cloud(live_query=live_query)
+            states = []
+            cloud.subscribe_connection_state(states.append)
+            task = await run_live_query(cloud, live_query)
+
+            while not states:
+                await asyncio.sleep(0.01)
+            assert states == [True]
+
+            await parse_server.sockets[0].close()
+            while len(states) < 3:
+                await asyncio.sleep(0.01)
+            assert states == [True, False, True]
+
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+            assert states == [True, False, True]
+
+    async def test_homes_share_one_socket(self, parse_server):
+        """Test updates for two homes on one socket reach the right home."""
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token")
+            homes = {}
+            for home_id in ("home-1", "home-2"):
+                cloud = PixiePlusCloud(
+                    None,
+                    "user@example.com",
+                    "password",
+                    user_object_id="user-1",
+                    session_token="r:token",
+                    current_home_id=home_id,
+                    live_group_id=f"live-{home_id}",
+                    live_query=live_query,
+                )
+                homes[home_id] = []
+                cloud.subscribe_home_updates(homes[home_id].append)
+                await cloud.async_subscribe()
+            task = asyncio.create_task(live_query.async_run())
+
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(6), 5)
+            assert parse_server.connect_count == 1
+            assert parse_server.subscriptions[5]["where"] == {"objectId": "home-2"}
+
+            await parse_server.push_update(
+                5, {"className": "Home", "objectId": "home-2"}
+            )
+            while not homes["home-2"]:
+                await asyncio.sleep(0.01)
+            assert homes["home-1"] == []
+
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+
+    async def test_heartbeat_measures_rtt(self, parse_server):
+        """Test pings are answered and their round trip time recorded."""
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token", stale_timeout=0.3)
+            cloud = make_cloud(live_query=live_query)
+            task = await run_live_query(cloud, live_query)
+
+            while cloud.metrics()["live_query"]["rtt"]["count"] < 2:
+                await asyncio.sleep(0.01)
+            metrics = cloud.metrics()["live_query"]
+            assert metrics["rtt"]["p50_ms"] is not None
+            assert metrics["since_last_message_ms"] < 300
+            assert metrics["stale_reconnects"] == 0
+
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+
+    async def test_silent_connection_is_reconnected(self, parse_server):
+        """Test a socket that stops answering pings is dropped and reopened."""
+        parse_server.autoping = False
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token", stale_timeout=0.3)
+            cloud = make_cloud(live_query=live_query)
+            states = []
+            cloud.subscribe_connection_state(states.append)
+            task = await run_live_query(cloud, live_query)
+
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(3), 5)
+            while parse_server.connect_count < 2:
+                await asyncio.sleep(0.01)
+            assert cloud.metrics()["live_query"]["stale_reconnects"] >= 1
+            assert states[:2] == [True, False]
+
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+
+    async def test_reconnects_after_server_close(self, parse_server):
+        """Test the client reconnects when the server drops the socket."""
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token")
+            cloud = make_cloud(live_query=live_query)
+            task = await run_live_query(cloud, live_query)
+
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(3), 5)
+            await parse_server.sockets[0].close()
+            while parse_server.connect_count < 2:
+                await asyncio.sleep(0.01)
+
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+
+    async def test_bad_messages_are_skipped(self, parse_server):
+        """Test malformed frames are logged and later updates still arrive."""
+
+        async with aiohttp.ClientSession() as websession:
+            live_query = PixiePlusLiveQuery(websession, "r:token")
+            cloud = make_cloud(live_query=live_query)
+            home_updates = []
+            cloud.subscribe_home_updates(home_updates.append)
+            task = await run_live_query(cloud, live_query)
+
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(3), 5)
+            await parse_server.sockets[0].send_str("not json")
+            await parse_server.sockets[0].send_str("[1, 2]")
+            await parse_server.push_update(2, home_object())
+            while not home_updates:
+                await asyncio.sleep(0.01)
+
+            assert not task.done()
+            assert parse_server.connect_count == 1
+            await live_query.async_close()
+            await asyncio.wait_for(task, 5)
+
+
+class TestPixiePlusCloudRequests:
+    """Tests for PixiePlus Cloud REST requests."""
+
+    async def test_send_live_group_requests_uses_batch(self):
+        """Test several frames are sent as one Parse batch request."""
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json=[{"success": {}}, {"success": {}}])
+
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        ) as httpx_client:
+            tracker = CommandLatencyTracker()
+            cloud = make_cloud(httpx_client, tracker)
+            request_times = await cloud.send_live_group_requests(["frame-1", "frame-2"])
+            next_times = await cloud.send_live_group_requests(["frame-3", "frame-4"])
+
+        # Back to back batches never reuse a request time
+        assert next_times[0] > request_times[-1]
+        assert len(requests) == 2
+        assert requests[0].url.path == "/p0/pixieCloud/batch"
+        body = json.loads(requests[0].content)
+        assert [request["path"] for request in body["requests"]] == [
+            "/p0/pixieCloud/classes/LiveGroup/live-1"
+        ] * 2
+        assert [
+            request["body"]["Request"]["data"]["data"] for request in body["requests"]
+        ] == ["frame-1", "frame-2"]
+        assert [
+            request["body"]["Request"]["time"] for request in body["requests"]
+        ] == request_times
+        assert request_times[1] == request_times[0] + 1
+        assert tracker.metrics()["http_put"]["count"] == 2
+        assert tracker.metrics()["pending"] == 4
+
+    async def test_stored_session_is_reused(self):
+        """Test a valid stored session skips the login round trips."""
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"objectId": "user-1"})
+
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        ) as httpx_client:
+            cloud = make_cloud(httpx_client)
+            assert await cloud.async_start_session() is False
+
+        assert [request.url.path for request in requests] == ["/p0/pixieCloud/users/me"]
+        assert cloud.session_token == "r:token"
+
+    async def test_rejected_session_logs_in_again(self):
+        """Test a rejected session token falls back to a full login."""
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.url.path.endswith("/users/me"):
+                return httpx.Response(
+                    400, json={"code": 209, "error": "Invalid session token"}
+                )
+            return httpx.Response(
+                200,
+                json={
+                    "objectId": "user-1",
+                    "sessionToken": "r:new",
+                    "curHome": {"objectId": "home-2"},
+                },
+            )
+
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        ) as httpx_client:
+            cloud = make_cloud(httpx_client)
+            assert await cloud.async_start_session() is True
+            credentials = await cloud.credentials()
+
+        assert [request.url.path for request in requests] == [
+            "/p0/pixieCloud/users/me",
+            "/p0/pixieCloud/login",
+        ]
+        assert cloud.session_token == "r:new"
+        # The login's current home is another home of the account
+        assert credentials["current_home_id"] == "home-1"
+
+    async def test_keep_alive_only_when_idle(self):
+        """Test the keep alive is skipped while commands use the connection."""
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={})
+
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        ) as httpx_client:
+            cloud = make_cloud(httpx_client)
+            assert await cloud.async_keep_alive() is True
+            assert await cloud.async_keep_alive() is False
+
+            cloud._last_request_at = None
+            await cloud.send_live_group_request("frame-1")
+            assert await cloud.async_keep_alive() is False
+
+        assert [request.url.path for request in requests] == [
+            "/p0/pixieCloud/health",
+            "/p0/pixieCloud/classes/LiveGroup/live-1",
+        ]
+        assert requests[1].headers["x-parse-session-token"] == "r:token"
+        assert cloud.metrics()["http_version"] == "HTTP/1.1"
+        assert cloud.metrics()["keep_alives"] == 1
+
+
+class TestPixiePlusCloudBootstrap:
+    """Tests for loading the account in as few round trips as possible."""
+
+    async def test_bootstrap_uses_one_batch(self, parse_server):
+        """Test bootstrap loads the Home and LiveGroup with a single batch."""
+        async with httpx.AsyncClient() as client:
+            cloud = PixiePlusCloud(client, "user@example.com", "password")
+            home_object = await cloud.bootstrap()
+            credentials = await cloud.credentials()
+
+        assert home_object["objectId"] == "home-1"
+        assert credentials["session_token"] == "r:token"
+        assert credentials["user_object_id"] == "user-1"
+        assert credentials["current_home_id"] == "home-1"
+        assert credentials["live_group_id"] == "live-1"
+        assert parse_server.requests == [
+            "/p0/pixieCloud/login",
+            "/p0/pixieCloud/batch",
+        ]
+
+    async def test_bootstrap_without_current_home(self, parse_server):
+        """Test the LiveGroup is looked up once the Home is known."""
+        parse_server.login_home = None
+        async with httpx.AsyncClient() as client:
+            cloud = PixiePlusCloud(client, "user@example.com", "password")
+            home_object = await cloud.bootstrap()
+
+            assert home_object["objectId"] == "home-1"
+            assert await cloud.liveGroupId() == "live-1"
+        assert parse_server.requests == [
+            "/p0/pixieCloud/login",
+            "/p0/pixieCloud/batch",
+            "/p0/pixieCloud/classes/LiveGroup",
+        ]
+
+    async def test_home_object_keys(self, parse_server):
+        """Test a status fetch only returns the projected Home fields."""
+        async with httpx.AsyncClient() as client:
+            cloud = make_cloud(client)
+            status = await cloud.home_object(HOME_STATUS_KEYS)
+            full = await cloud.home_object()
+
+        assert set(status) == {"objectId", "updatedAt", "onlineList"}
+        assert full["deviceList"]
+
+    async def test_home_object_is_scoped_to_entry_home(self, parse_server):
+        """Test an account with several homes only fetches the entry's home."""
+        parse_server.objects["Home"].append(
+            {**home_object(), "objectId": "home-2", "updatedAt": "2024-01-02T00:00:00Z"}
+        )
+        updated_at = parse_updated_at(home_object()["updatedAt"])
+        async with httpx.AsyncClient() as client:
+            first = make_cloud(client)
+            full = await first.home_object()
+            unchanged = await first.home_object(HOME_STATUS_KEYS, updated_at)
+
+        assert full["objectId"] == "home-1"
+        assert unchanged is None
+
+
+class TestReconnectDelay:
+    """Tests for the LiveQuery reconnect backoff."""
+
+    def test_delay_doubles_with_jitter_up_to_maximum(self):
+        """Test each attempt waits between half and all of its backoff."""
+        for attempt, backoff in ((0, 1), (1, 2), (3, 8), (20, 300)):
+            delays = [pixieplus_cloud.reconnect_delay(attempt) for _ in range(50)]
+            assert all(backoff / 2 <= delay <= backoff for delay in delays)
+            assert len(set(delays)) > 1
+
+
+class TestJsonCodec:
+    """Tests for the cloud JSON codec."""
+
+    def test_json_codec_round_trip(self):
+        """Test the codec encodes compact bytes and decodes them back."""
+        home = home_object()
+
+        payload = pixieplus_cloud.json_dumps(home)
+
+        assert isinstance(payload, bytes)
+        assert pixieplus_cloud.json_loads(payload) == home
+        assert pixieplus_cloud.json_loads(payload.decode()) == home
+
+    async def test_conditional_home_fetch(self, parse_server):
+        """Test a conditional fetch returns None when the Home is unchanged."""
+        updated_at = parse_updated_at(home_object()["updatedAt"])
+        async with httpx.AsyncClient() as client:
+            cloud = make_cloud(client)
+            unchanged = await cloud.home_object(HOME_STATUS_KEYS, updated_at)
+            changed = await cloud.home_object(
+                HOME_STATUS_KEYS, updated_at - timedelta(seconds=1)
+            )
+
+        assert unchanged is None
+        assert changed["onlineList"]
@@ -0,0 +1,213 @@
+import asyncio
+
+import pytest
+
+from custom_components.pixieplus.pixieplus_commands import (
+    CommandScheduler,
+    PRIORITY_LOW,
+)
+
+
+class FakeCloud:
+    def __init__(self):
+        self.batches = []
+
+    async def send_batch(self, commands):
+        self.batches.append([command.ble_data for command in commands])
+        await asyncio.sleep(0)
+        return [1000] * len(commands)
+
+
+class TestCommandScheduler:
+    """Tests for the LiveGroup command scheduler."""
+
+    async def test_commands_in_window_share_one_batch(self, hass):
+        """Test commands issued together are sent in a single batch."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01, burst=50)
+
+        results = await asyncio.gather(
+            *(scheduler.async_send(f"frame-{n}") for n in range(40))
+        )
+
+        assert results == [1000] * 40
+        assert cloud.batches == [[f"frame-{n}" for n in range(40)]]
+        metrics = scheduler.metrics()
+        assert metrics["batches"] == 1
+        assert metrics["last_batch_size"] == 40
+
+    async def test_batches_are_split_at_max_size(self, hass):
+        """Test large bursts are split into batches of at most max size."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(
+            hass, cloud.send_batch, window=0.01, max_batch_size=3
+        )
+
+        await asyncio.gather(*(scheduler.async_send(f"frame-{n}") for n in range(7)))
+
+        assert [len(batch) for batch in cloud.batches] == [3, 3, 1]
+
+    async def test_send_failure_is_raised_to_callers(self, hass):
+        """Test a failed batch raises in every waiting caller."""
+
+        async def send_batch(commands):
+            raise RuntimeError("offline")
+
+        scheduler = CommandScheduler(hass, send_batch, window=0.01)
+        results = await asyncio.gather(
+            scheduler.async_send("a"), scheduler.async_send("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def test_keyed_commands_are_latest_wins(self, hass):
+        """Test newer keyed commands replace queued ones."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01)
+
+        await asyncio.gather(
+            scheduler.async_send("bright-10", key=(1, "set_brightness")),
+            scheduler.async_send("off-2"),
+            scheduler.async_send("bright-20", key=(1, "set_brightness")),
+            scheduler.async_send("bright-30", key=(1, "set_brightness")),
+        )
+
+        assert cloud.batches == [["off-2", "bright-30"]]
+        assert scheduler.metrics()["superseded"] == 2
+
+    async def test_commands_queued_in_flight_are_latest_wins(self, hass):
+        """Test values queued while a batch is in flight collapse to the newest."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01)
+
+        first = asyncio.create_task(scheduler.async_send("bright-10", key=1))
+        while not cloud.batches:
+            await asyncio.sleep(0)
+        await asyncio.gather(
+            first,
+            scheduler.async_send("bright-20", key=1),
+            scheduler.async_send("bright-30", key=1),
+        )
+
+        assert cloud.batches == [["bright-10"], ["bright-30"]]
+
+    async def test_high_priority_commands_go_first(self, hass):
+        """Test on/off commands leave before queued brightness commands."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01)
+
+        await asyncio.gather(
+            scheduler.async_send("bright-1", key=1, priority=PRIORITY_LOW),
+            scheduler.async_send("on-2"),
+            scheduler.async_send("bright-3", key=3, priority=PRIORITY_LOW),
+            scheduler.async_send("off-4"),
+        )
+
+        assert cloud.batches == [["on-2", "off-4", "bright-1", "bright-3"]]
+
+    async def test_priority_keeps_order_for_one_device(self, hass):
+        """Test an off drops the brightness change queued before it."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01)
+
+        results = await asyncio.gather(
+            scheduler.async_send(
+                "bright-1", key=(1, "set_brightness"), priority=PRIORITY_LOW, device=1
+            ),
+            scheduler.async_send(
+                "bright-2", key=(2, "set_brightness"), priority=PRIORITY_LOW, device=2
+            ),
+            scheduler.async_send("off-1", device=1, replace_low_priority=True),
+        )
+
+        assert results == [None, 1000, 1000]
+        assert cloud.batches == [["off-1", "bright-2"]]
+        assert scheduler.metrics()["superseded"] == 1
+
+    async def test_on_waits_for_queued_brightness(self, hass):
+        """Test an on does not drop or overtake the level queued before it."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01)
+
+        results = await asyncio.gather(
+            scheduler.async_send(
+                "bright-1", key=(1, "set_brightness"), priority=PRIORITY_LOW, device=1
+            ),
+            scheduler.async_send("on-1", device=1),
+            scheduler.async_send("on-2", device=2),
+        )
+
+        assert results == [1000, 1000, 1000]
+        assert cloud.batches == [["on-2", "bright-1"], ["on-1"]]
+        assert scheduler.metrics()["superseded"] == 0
+
+    async def test_one_frame_per_device_per_batch(self, hass):
+        """Test frames for one device go out in order in separate batches."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(hass, cloud.send_batch, window=0.01)
+
+        await asyncio.gather(
+            scheduler.async_send("on-1", device=1),
+            scheduler.async_send("on-2", device=2),
+            scheduler.async_send("off-1", device=1),
+        )
+
+        assert cloud.batches == [["on-1", "on-2"], ["off-1"]]
+
+    async def test_gateway_rate_is_limited(self, hass):
+        """Test a burst larger than the bucket is spread over time."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(
+            hass, cloud.send_batch, window=0.01, rate=100, burst=2
+        )
+
+        await asyncio.gather(*(scheduler.async_send(f"frame-{n}") for n in range(5)))
+
+        assert [len(batch) for batch in cloud.batches][0] == 2
+        assert sum(len(batch) for batch in cloud.batches) == 5
+        assert scheduler.metrics()["throttled"] > 0
+
+    async def test_expired_commands_are_dropped(self, hass):
+        """Test commands past their deadline are not sent."""
+
+        cloud = FakeCloud()
+        scheduler = CommandScheduler(
+            hass, cloud.send_batch, window=0.01, rate=20, burst=1
+        )
+
+        results = await asyncio.gather(
+            scheduler.async_send("on-1"),
+            scheduler.async_send("bright-2", priority=PRIORITY_LOW, deadline=0.01),
+        )
+
+        assert results == [1000, None]
+        assert cloud.batches == [["on-1"]]
+        metrics = scheduler.metrics()
+        assert metrics["expired"] == 1
+        assert metrics["queue_depth"] == {"high": 0, "low": 0}
+
+    async def test_shutdown_cancels_batch_in_flight(self, hass):
+        """Test callers of a batch being sent do not wait past shutdown."""
+
+        sending = asyncio.Event()
+
+        async def send_batch(commands):
+            sending.set()
+            await asyncio.sleep(10)
+
+        scheduler = CommandScheduler(hass, send_batch, window=0.01)
+        caller = asyncio.create_task(scheduler.async_send("on-1", device=1))
+        await sending.wait()
+
+        scheduler.async_shutdown()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(caller, 1)
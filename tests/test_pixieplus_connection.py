@@ -0,0 +1,45 @@
+from custom_components.pixieplus.pixieplus_connection import (
+    async_get_connection_manager,
+)
+
+
+class TestPixiePlusConnectionManager:
+    """Tests for the per account connection manager."""
+
+    async def test_entries_of_one_account_share_a_connection(self, hass):
+        """Test the connection is shared and closed by the last release."""
+        manager = async_get_connection_manager(hass)
+
+        first = manager.acquire("user@example.com")
+        second = manager.acquire("User@Example.com")
+        other = manager.acquire("other@example.com")
+
+        assert first is second
+        assert first is not other
+        assert first.references == 2
+        assert len(manager) == 2
+
+        await manager.async_release(first)
+        assert not first.http_client.is_closed
+
+        await manager.async_release(second)
+        assert first.http_client.is_closed
+        assert len(manager) == 1
+
+        await manager.async_release(other)
+        assert len(manager) == 0
+        assert async_get_connection_manager(hass) is manager
+
+    async def test_shared_socket_uses_smallest_stale_timeout(self, hass):
+        """Test every holder's stale timeout is honoured by the shared socket."""
+        manager = async_get_connection_manager(hass)
+
+        first = manager.acquire("user@example.com", 120)
+        manager.acquire("user@example.com", 30)
+        assert first.live_query._stale_timeout == 30
+
+        await manager.async_release(first, 30)
+        assert first.live_query._stale_timeout == 120
+
+        await manager.async_release(first, 120)
+        assert len(manager) == 0
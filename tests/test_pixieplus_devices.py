@@ -0,0 +1,32 @@
+from homeassistant.components.light import ColorMode
+
+from custom_components.pixieplus.pixieplus_devices import device_capabilities
+
+
+class TestDeviceCapabilities:
+    """Tests for the per model capability descriptors."""
+
+    def test_descriptor_is_shared_per_model(self):
+        """Test every lookup of a model returns the same descriptor."""
+
+        assert device_capabilities(23, 13) is device_capabilities(23, 13)
+        assert device_capabilities(23, 13) is not device_capabilities(22, 13)
+
+    def test_color_modes(self):
+        """Test the color modes follow the model's specs."""
+
+        assert device_capabilities(22, 13).color_modes == {ColorMode.ONOFF}
+        assert device_capabilities(23, 13).color_modes == {ColorMode.BRIGHTNESS}
+        assert device_capabilities(25, 4).color_modes == {ColorMode.COLOR_TEMP}
+        assert device_capabilities(27, 2).color_modes == {ColorMode.RGB}
+        assert isinstance(device_capabilities(27, 2).color_modes, frozenset)
+
+    def test_flags_and_model(self):
+        """Test the flags and device info fields of a dimmer."""
+
+        capabilities = device_capabilities(23, 13)
+        assert capabilities.light and capabilities.dimmer
+        assert not capabilities.rgb and not capabilities.cct
+        assert capabilities.model == "Smart Dimmer G3 - SDD300BTAM"
+        assert capabilities.manufacturer == "SAL"
+        assert not device_capabilities(1, 2).light
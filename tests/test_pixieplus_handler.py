@@ -0,0 +1,408 @@
+from datetime import timedelta
+import asyncio
+import gc
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+import weakref
+
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.pixieplus.command_utils import make_ble_command_data
+from custom_components.pixieplus.const import CMD_ON, DOMAIN, STATUS_SAVE_DELAY
+from custom_components.pixieplus.pixieplus_connection import (
+    async_get_connection_manager,
+)
+from custom_components.pixieplus.pixieplus_handler import PixiePlusHandler
+
+RELOADS = 20
+
+ENTRY_DATA = {
+    "username": "user@example.com",
+    "password": "password",
+    "installation_id": "installation",
+    "session_token": "r:token",
+    "user_object_id": "user-1",
+    "current_home_id": "home-1",
+    "live_group_id": "live-1",
+    "devices": [
+        {"id": 1, "type": 23, "stype": 13},
+        {"id": 2, "type": 22, "stype": 13},
+    ],
+    "gateway": {"id": 3, "type": 1, "stype": 2},
+}
+
+
+def home_object(online_list):
+    return {
+        "objectId": "home-1",
+        "deviceList": [{"id": 1}, {"id": 2}, {"id": 3}],
+        "onlineList": online_list,
+    }
+
+
+@pytest.fixture
+async def handler(hass):
+    entry = MockConfigEntry(domain=DOMAIN, data=ENTRY_DATA)
+    entry.add_to_hass(hass)
+    handler = PixiePlusHandler(hass, entry)
+    yield handler
+    await handler.async_shutdown()
+
+
+class TestPixiePlusHandler:
+    """Tests for the PixiePlus handler."""
+
+    async def test_only_changed_devices_are_notified(self, handler):
+        """Test a Home update only notifies entities whose status changed."""
+
+        notified = []
+        handler.async_add_listener(lambda: notified.append(1), 1)
+        handler.async_add_listener(lambda: notified.append(2), 2)
+
+        handler._on_home_update_message(
+            home_object({"1": {"br": 50, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        assert sorted(notified) == [1, 2]
+
+        notified.clear()
+        handler._on_home_update_message(
+            home_object({"1": {"br": 80, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        assert notified == [1]
+        assert handler.metrics()["suppressed_writes"] == 1
+
+    async def test_live_group_echo_updates_device(self, handler):
+        """Test an echoed brightness command updates the device at once."""
+
+        notified = []
+        handler.async_add_listener(lambda: notified.append(1), 1)
+        handler.async_add_listener(lambda: notified.append(2), 2)
+        handler._on_home_update_message(
+            home_object({"1": {"br": 0, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        notified.clear()
+
+        handler._on_live_group_update_message(
+            {
+                "objectId": "live-1",
+                "Request": {
+                    "data": {
+                        "data": "00000003040100c46969ffffff32000000000000",
+                        "type": "bleData",
+                    }
+                },
+            }
+        )
+
+        assert notified == [1]
+        assert handler.data.get(1).br == 50
+
+    async def test_rgb_strip_brightness_echo_updates_device(self, handler):
+        """Test a brightness echo is recognised on a device sharing its id."""
+
+        # RGB strips share the dimmer command id between colour and brightness
+        handler._device_types[1] = (27, 2)
+        handler._on_home_update_message(
+            home_object({"1": {"br": 0, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+
+        handler._on_live_group_update_message(
+            {
+                "objectId": "live-1",
+                "Request": {
+                    "data": {
+                        "data": "00000003040100c46969ffffff32000000000000",
+                        "type": "bleData",
+                    }
+                },
+            }
+        )
+
+        assert handler.data.get(1).br == 50
+
+    async def test_on_echo_restores_last_level(self, handler):
+        """Test an echoed on brings back the last level instead of full."""
+
+        on_echo = {
+            "objectId": "live-1",
+            "Request": {
+                "data": {
+                    "data": make_ble_command_data(23, 13, 1, CMD_ON, None),
+                    "type": "bleData",
+                }
+            },
+        }
+        handler._on_home_update_message(
+            home_object({"1": {"br": 0, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        handler._on_live_group_update_message(on_echo)
+        assert handler.data.get(1).br == 0
+
+        handler._on_home_update_message(
+            home_object({"1": {"br": 30, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        handler._on_home_update_message(
+            home_object({"1": {"br": 0, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        handler._on_live_group_update_message(on_echo)
+        assert handler.data.get(1).br == 30
+
+    async def test_command_is_confirmed_by_snapshot(self, handler):
+        """Test a command is confirmed by the snapshot after its echo."""
+
+        async def send_live_group_requests(ble_data_list):
+            request_times = [1000 + n for n in range(len(ble_data_list))]
+            handler._command_latency.request_sent(request_times, time.monotonic())
+            return request_times
+
+        handler._pixieplus_cloud.send_live_group_requests = send_live_group_requests
+        handler._on_home_update_message(
+            home_object({"1": {"br": 0, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+
+        await handler.async_set_white_brightness(23, 13, 1, 50)
+        handler._on_live_group_update_message(
+            {
+                "objectId": "live-1",
+                "Request": {
+                    "data": {
+                        "data": "00000003040100c46969ffffff32000000000000",
+                        "type": "bleData",
+                    },
+                    "time": 1000,
+                },
+            }
+        )
+        handler._on_home_update_message(
+            home_object({"1": {"br": 50, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+
+        latency = handler.metrics()["command_latency"]
+        assert latency["echo"]["count"] == 1
+        assert latency["device_confirmed"]["count"] == 1
+
+    async def test_device_list_change_reloads_entry(self, hass, handler):
+        """Test a new device in the status snapshot reloads the device list."""
+
+        def device(device_id, device_type, device_stype):
+            return {
+                "id": device_id,
+                "mac": "00:00:00:00:00:00",
+                "type": device_type,
+                "stype": device_stype,
+                "version": 1,
+            }
+
+        full_home = home_object({})
+        full_home["deviceList"] = [
+            device(1, 23, 13),
+            device(2, 22, 13),
+            {**device(3, 1, 2), "bridgeName": "Gateway"},
+            device(4, 23, 13),
+        ]
+        handler._pixieplus_cloud.home_object = AsyncMock(return_value=full_home)
+
+        status = {"br": 0, "hue": 0}
+        with patch.object(hass.config_entries, "async_schedule_reload") as reload:
+            handler._on_home_update_message(home_object({"1": status, "2": status}))
+            await hass.async_block_till_done()
+            handler._pixieplus_cloud.home_object.assert_not_called()
+
+            handler._on_home_update_message(
+                home_object({"1": status, "2": status, "4": status})
+            )
+            await hass.async_block_till_done()
+
+        handler._pixieplus_cloud.home_object.assert_awaited_once_with()
+        reload.assert_called_once_with(handler._entry.entry_id)
+        assert [device["id"] for device in handler._entry.data["devices"]] == [
+            1,
+            2,
+            4,
+        ]
+
+    async def test_polls_only_while_push_is_down(self, hass, handler):
+        """Test the poll interval backs off and stops once push is healthy."""
+        handler._pixieplus_cloud.home_object = AsyncMock(return_value=None)
+        assert handler.update_interval == timedelta(seconds=5)
+
+        await handler._async_update_data()
+        await handler._async_update_data()
+        assert handler.update_interval == timedelta(seconds=20)
+        assert handler.metrics()["polling"]["mode"] == "poll"
+
+        handler._on_push_state(True)
+        assert handler.update_interval is None
+        assert handler.metrics()["polling"] == {
+            "mode": "push",
+            "interval_s": None,
+            "polls": 2,
+            "unchanged_polls": 2,
+        }
+
+        # One resync picks up what changed while push was down
+        await hass.async_block_till_done()
+        assert handler._pixieplus_cloud.home_object.await_count == 3
+
+        handler._on_push_state(False)
+        assert handler.update_interval == timedelta(seconds=5)
+
+    async def test_reconnect_resyncs_once(self, hass, handler):
+        """Test a restored connection resyncs and reports time to consistency."""
+        handler._pixieplus_cloud.home_object = AsyncMock(
+            return_value=home_object({"1": {"br": 30, "hue": 0}})
+        )
+        handler._on_push_state(True)
+        await hass.async_block_till_done()
+        assert handler.metrics()["reconnects"] == 0
+
+        handler._on_push_state(False)
+        handler._on_push_state(True)
+        await hass.async_block_till_done()
+
+        assert handler._pixieplus_cloud.home_object.await_count == 2
+        assert handler.data.get(1).br == 30
+        metrics = handler.metrics()
+        assert metrics["reconnects"] == 1
+        assert metrics["time_to_consistent"]["last_ms"] is not None
+
+    async def test_statuses_are_saved_and_restored(
+        self, hass, hass_storage, freezer, handler
+    ):
+        """Test changed statuses are saved after a delay and restored later."""
+        key = f"{DOMAIN}.{handler._entry.entry_id}.status"
+        handler._on_home_update_message(
+            home_object({"1": {"br": 50, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        handler._on_home_update_message(
+            home_object({"1": {"br": 70, "hue": 0}, "2": {"br": 0, "hue": 0}})
+        )
+        await hass.async_block_till_done()
+        assert key not in hass_storage
+
+        freezer.tick(timedelta(seconds=STATUS_SAVE_DELAY + 1))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+        assert hass_storage[key]["data"]["devices"]["1"]["br"] == 70
+
+        restarted = PixiePlusHandler(hass, handler._entry)
+        try:
+            await restarted.async_load_status()
+            assert restarted.data.get(1).br == 70
+            assert restarted.data.get(2).known
+        finally:
+            await restarted.async_shutdown()
+
+    async def test_pending_save_is_flushed_on_shutdown(
+        self, hass, hass_storage, handler
+    ):
+        """Test a save still waiting on its delay is written at unload."""
+        handler._on_home_update_message(home_object({"1": {"br": 20, "hue": 0}}))
+        await handler.async_shutdown()
+
+        key = f"{DOMAIN}.{handler._entry.entry_id}.status"
+        assert hass_storage[key]["data"]["devices"]["1"]["br"] == 20
+
+
+class TestPixiePlusHandlerLifecycle:
+    """Tests for setting the handler up and tearing it down."""
+
+    async def test_reload_soak_releases_everything(self, hass, parse_server):
+        """Test repeated setup and shutdown leaves no sockets or handlers."""
+        entry = MockConfigEntry(domain=DOMAIN, data=ENTRY_DATA)
+        entry.add_to_hass(hass)
+        manager = async_get_connection_manager(hass)
+        handlers = weakref.WeakSet()
+        threads = threading.active_count()
+
+        for _ in range(RELOADS):
+            handler = PixiePlusHandler(hass, entry)
+            handlers.add(handler)
+            await handler._async_setup()
+            live_query = handler._connection.live_query
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(3), 5)
+
+            await handler.async_shutdown()
+            await hass.async_block_till_done()
+            await asyncio.wait_for(parse_server.wait_for_disconnect(), 5)
+            assert live_query.metrics()["connected"] is False
+            parse_server.subscriptions.clear()
+
+        del handler, live_query
+        gc.collect()
+        assert parse_server.connect_count == RELOADS
+        assert len(manager) == 0
+        assert len(handlers) == 0
+        assert threading.active_count() <= threads
+
+    async def test_start_overlaps_session_check_and_first_fetch(
+        self, hass, parse_server
+    ):
+        """Test startup fetches statuses while the session is still checked."""
+        parse_server.delay = 0.1
+        entry = MockConfigEntry(domain=DOMAIN, data=ENTRY_DATA)
+        entry.add_to_hass(hass)
+        handler = PixiePlusHandler(hass, entry)
+        try:
+            handler.async_start()
+            await asyncio.wait_for(handler._start_task, 5)
+            await asyncio.wait_for(parse_server.wait_for_subscriptions(3), 5)
+
+            assert handler.data.get(1).known
+            startup = handler.metrics()["startup"]
+            assert {"session", "subscribe", "first_refresh", "ready"} <= set(startup)
+            assert startup["ready"] < startup["session"] + startup["first_refresh"]
+        finally:
+            await handler.async_shutdown()
+
+    async def test_relogin_keeps_configured_home(self, hass, parse_server):
+        """Test a rejected session only persists the new session token."""
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={
+                **ENTRY_DATA,
+                "session_token": "r:expired",
+                "current_home_id": "home-2",
+                "live_group_id": "live-2",
+            },
+        )
+        entry.add_to_hass(hass)
+        handler = PixiePlusHandler(hass, entry)
+        try:
+            await handler._async_setup()
+        finally:
+            await handler.async_shutdown()
+
+        assert entry.data["session_token"] == "r:token"
+        assert entry.data["current_home_id"] == "home-2"
+        assert entry.data["live_group_id"] == "live-2"
+
+    async def test_shared_socket_outlives_first_unload(self, hass, parse_server):
+        """Test unloading one home unsubscribes it but keeps the socket open."""
+        first_entry = MockConfigEntry(domain=DOMAIN, data=ENTRY_DATA)
+        second_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={**ENTRY_DATA, "current_home_id": "home-2", "live_group_id": "live-2"},
+        )
+        first_entry.add_to_hass(hass)
+        second_entry.add_to_hass(hass)
+        first = PixiePlusHandler(hass, first_entry)
+        second = PixiePlusHandler(hass, second_entry)
+        await first._async_setup()
+        await second._async_setup()
+        await asyncio.wait_for(parse_server.wait_for_subscriptions(6), 5)
+        assert parse_server.connect_count == 1
+
+        await first.async_shutdown()
+        while len(parse_server.subscriptions) > 3:
+            await asyncio.sleep(0.01)
+        assert parse_server.subscriptions[5]["where"] == {"objectId": "home-2"}
+        assert len(parse_server.sockets) == 1
+
+        await second.async_shutdown()
+        await asyncio.wait_for(parse_server.wait_for_disconnect(), 5)
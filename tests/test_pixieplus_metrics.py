@@ -0,0 +1,77 @@
+import time
+
+from custom_components.pixieplus.pixieplus_metrics import (
+    CommandLatencyTracker,
+    LatencyHistogram,
+    PhaseTimer,
+)
+
+
+class TestLatencyHistogram:
+    """Tests for the rolling latency histogram."""
+
+    def test_percentiles(self):
+        """Test percentiles over the sample window."""
+
+        histogram = LatencyHistogram()
+        for n in range(1, 101):
+            histogram.add(n / 1000)
+
+        assert histogram.as_ms() == {
+            "count": 100,
+            "p50_ms": 50.0,
+            "p95_ms": 95.0,
+            "p99_ms": 99.0,
+        }
+
+    def test_window_is_bounded(self):
+        """Test only the newest samples are kept."""
+
+        histogram = LatencyHistogram(size=2)
+        for n in (1, 2, 3):
+            histogram.add(n)
+
+        assert histogram.percentile(0) == 2
+
+
+class TestCommandLatencyTracker:
+    """Tests for command round-trip tracking."""
+
+    def test_send_echo_and_confirm_are_correlated(self):
+        """Test a request is followed through echo and device change."""
+
+        tracker = CommandLatencyTracker()
+        tracker.expect_devices({7: lambda status: status["br"] == 50})
+        tracker.request_sent([1700000000123], time.monotonic())
+        tracker.request_completed(0.05)
+
+        tracker.echo_received(1700000000999)
+        tracker.echo_received(1700000000123)
+        tracker.devices_reported({"3": {"br": 50}, "7": {"br": 0}})
+        assert tracker.metrics()["device_confirmed"]["count"] == 0
+        tracker.devices_reported({"3": {"br": 50}, "7": {"br": 50}})
+
+        metrics = tracker.metrics()
+        assert metrics["http_put"]["count"] == 1
+        assert metrics["echo"]["count"] == 1
+        assert metrics["device_confirmed"]["count"] == 1
+        assert metrics["pending"] == 0
+
+
+class TestPhaseTimer:
+    """Tests for the startup phase timer."""
+
+    def test_phases_and_marks(self):
+        """Test phases are timed and marks keep their first value."""
+
+        timer = PhaseTimer()
+        with timer.phase("session"):
+            pass
+        timer.mark("ready")
+        first = timer.as_ms()["ready"]
+        timer.mark("ready")
+
+        timings = timer.as_ms()
+        assert list(timings) == ["session", "ready"]
+        assert timings["session"] >= 0
+        assert timings["ready"] == first
@@ -0,0 +1,23 @@
+from custom_components.pixieplus.pixieplus_polling import PollingBackoff
+
+
+class TestPollingBackoff:
+    """Tests for the polling fallback interval."""
+
+    def test_backs_off_to_maximum(self):
+        """Test unchanged polls double the interval up to the maximum."""
+        backoff = PollingBackoff(5, 30)
+
+        assert [backoff.next(False) for _ in range(4)] == [10, 20, 30, 30]
+        assert backoff.unchanged_polls == 4
+
+    def test_changes_and_reset_return_to_initial(self):
+        """Test a poll with changes or a reset polls fast again."""
+        backoff = PollingBackoff(5, 30)
+        backoff.next(False)
+        backoff.next(False)
+
+        assert backoff.next(True) == 5
+        backoff.next(False)
+        assert backoff.reset() == 5
+        assert backoff.polls == 4
@@ -0,0 +1,79 @@
+from custom_components.pixieplus.pixieplus_store import DeviceStateStore
+
+
+def home_object(updated_at, online_list):
+    return {"objectId": "home-1", "updatedAt": updated_at, "onlineList": online_list}
+
+
+class TestDeviceStateStore:
+    """Tests for the keyed device state store."""
+
+    def test_apply_home_returns_changed_devices(self):
+        """Test only devices whose status changed are reported."""
+
+        store = DeviceStateStore([1, 2])
+        changed = store.apply_home(
+            home_object(
+                "2024-01-01T00:00:00.000Z",
+                {"1": {"br": 10, "hue": 0}, "2": {"br": 0, "hue": 0}},
+            )
+        )
+        assert changed == {1, 2}
+
+        changed = store.apply_home(
+            home_object(
+                "2024-01-01T00:00:01.000Z",
+                {"1": {"br": 20, "hue": 0}, "2": {"br": 0, "hue": 0}},
+            )
+        )
+        assert changed == {1}
+        assert store.get(1).br == 20
+        assert store.get(1).version == 2
+        assert store.get(2).version == 1
+
+    def test_unknown_devices_are_ignored(self):
+        """Test statuses for devices not in the store are ignored."""
+
+        store = DeviceStateStore([1])
+        changed = store.apply_home(home_object(None, {"9": {"br": 10, "hue": 0}}))
+
+        assert changed == set()
+        assert store.get(9) is None
+
+    def test_stale_snapshot_is_discarded(self):
+        """Test an older snapshot cannot overwrite a newer one."""
+
+        store = DeviceStateStore([1])
+        store.apply_home(
+            home_object("2024-01-01T00:00:05.000Z", {"1": {"br": 80, "hue": 0}})
+        )
+        changed = store.apply_home(
+            home_object("2024-01-01T00:00:01.000Z", {"1": {"br": 10, "hue": 0}})
+        )
+
+        assert changed == set()
+        assert store.get(1).br == 80
+        assert store.metrics()["stale_snapshots"] == 1
+
+    def test_restore_round_trip(self):
+        """Test saved statuses restore into a store with a new device list."""
+
+        store = DeviceStateStore([1, 2])
+        store.apply_home(
+            home_object(
+                "2024-01-01T00:00:05.000Z",
+                {"1": {"br": 80, "hue": 0, "online": True}},
+            )
+        )
+
+        restored = DeviceStateStore([1, 3])
+        assert restored.restore(store.as_dict()) == {1}
+        assert restored.get(1).br == 80
+        assert restored.get(1).online is True
+        assert not restored.get(3).known
+        assert restored.updated_at == store.updated_at
+
+        changed = restored.apply_home(
+            home_object("2024-01-01T00:00:01.000Z", {"1": {"br": 10, "hue": 0}})
+        )
+        assert changed == set()
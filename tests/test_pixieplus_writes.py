@@ -0,0 +1,93 @@
+import asyncio
+
+from custom_components.pixieplus.pixieplus_writes import EntityWriteScheduler
+
+MIN_INTERVAL = 0.05
+
+
+class FakeEntity:
+    def __init__(self):
+        self.state = None
+        self.written = []
+
+    def visible_state(self):
+        return self.state
+
+    def write(self):
+        self.written.append(self.state)
+
+
+class TestEntityWriteScheduler:
+    """Tests for coalescing entity state writes."""
+
+    async def test_burst_becomes_one_trailing_write(self, hass):
+        """Test writes within the interval merge into one with the last state."""
+
+        scheduler = EntityWriteScheduler(hass, MIN_INTERVAL)
+        entity = FakeEntity()
+        for state in ("on", "dim", "bright"):
+            entity.state = state
+            scheduler.async_request_write("light", entity.visible_state, entity.write)
+        assert entity.written == ["on"]
+
+        await asyncio.sleep(MIN_INTERVAL * 2)
+        assert entity.written == ["on", "bright"]
+        assert scheduler.metrics() == {"writes": 2, "avoided_writes": 1}
+
+    async def test_unchanged_state_is_not_written(self, hass):
+        """Test an echo of the state already written is skipped."""
+
+        scheduler = EntityWriteScheduler(hass, MIN_INTERVAL)
+        entity = FakeEntity()
+        entity.state = "on"
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+        await asyncio.sleep(MIN_INTERVAL * 2)
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+
+        assert entity.written == ["on"]
+        assert scheduler.metrics() == {"writes": 1, "avoided_writes": 2}
+
+    async def test_entities_are_limited_separately(self, hass):
+        """Test one light's writes do not hold back another's."""
+
+        scheduler = EntityWriteScheduler(hass, MIN_INTERVAL)
+        first, second = FakeEntity(), FakeEntity()
+        first.state = second.state = "on"
+        scheduler.async_request_write("first", first.visible_state, first.write)
+        scheduler.async_request_write("second", second.visible_state, second.write)
+
+        assert first.written == second.written == ["on"]
+
+    async def test_forget_cancels_pending_write(self, hass):
+        """Test a removed entity is not written after removal."""
+
+        scheduler = EntityWriteScheduler(hass, MIN_INTERVAL)
+        entity = FakeEntity()
+        entity.state = "on"
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+        entity.state = "off"
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+        scheduler.async_forget("light")
+
+        await asyncio.sleep(MIN_INTERVAL * 2)
+        assert entity.written == ["on"]
+
+    async def test_immediate_write_skips_interval(self, hass):
+        """Test an optimistic write is not held back by the interval."""
+
+        scheduler = EntityWriteScheduler(hass, MIN_INTERVAL)
+        entity = FakeEntity()
+        entity.state = "on"
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+        entity.state = "dim"
+        scheduler.async_request_write("light", entity.visible_state, entity.write)
+        entity.state = "off"
+        scheduler.async_request_write(
+            "light", entity.visible_state, entity.write, immediate=True
+        )
+        assert entity.written == ["on", "off"]
+
+        # The immediate write replaced the trailing one
+        await asyncio.sleep(MIN_INTERVAL * 2)
+        assert entity.written == ["on", "off"]